@@ -2,7 +2,8 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox
 )
 from PyQt6.QtCore import Qt
-import sqlite3
+
+import operations
 
 class AddClientDialog(QDialog):
     def __init__(self, parent):
@@ -112,14 +113,10 @@ class AddClientDialog(QDialog):
             QMessageBox.warning(self, "خطأ في الإدخال", "يرجى إدخال أرقام صحيحة للمبالغ.")
             return
 
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO clients (name, paid_amount, owed_amount, total_bill) 
-            VALUES (?, ?, ?, ?)
-        """, (name, paid, owed, total_bill))
-        conn.commit()
-        conn.close()
+        try:
+            operations.add_client(name, paid, owed, total_bill)
 
-        QMessageBox.information(self, "نجاح", "تم إضافة العميل بنجاح.")
-        self.close()
+            QMessageBox.information(self, "نجاح", "تم إضافة العميل بنجاح.")
+            self.close()
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل إضافة العميل: {e}")
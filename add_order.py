@@ -4,8 +4,11 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QComboBox, QLineEdit, QPushButton, QMessageBox, QHBoxLayout, QCheckBox
 )
 from PyQt6.QtCore import Qt
-import sqlite3
-from datetime import datetime
+
+import client_directory
+import operations
+from models import client_list_model
+from widgets import ClientSearchBox
 
 class AddOrderDialog(QDialog):
     def __init__(self, parent):
@@ -30,6 +33,10 @@ class AddOrderDialog(QDialog):
             border-radius: 5px;
         """)
         self.layout.addWidget(self.client_label)
+        # Type-ahead search picks the client in the combo box
+        self.client_search = ClientSearchBox()
+        self.client_search.client_selected.connect(self.select_client)
+        self.layout.addWidget(self.client_search)
         self.layout.addWidget(self.client_combobox)
 
         # Order name
@@ -141,13 +148,11 @@ class AddOrderDialog(QDialog):
         self.populate_clients()
 
     def populate_clients(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM clients")
-        clients = cursor.fetchall()
-        conn.close()
-        for client in clients:
-            self.client_combobox.addItem(client[1], client[0])
+        # Shared list, read from the database only when clients changed
+        self.client_combobox.setModel(client_list_model())
+
+    def select_client(self, client_id):
+        self.client_combobox.setCurrentIndex(client_directory.index_of(client_id))
 
     def calculate_total_price(self):
         try:
@@ -169,16 +174,6 @@ class AddOrderDialog(QDialog):
         total_price = self.total_price_input.text()
         payment_type = self.payment_type_combobox.currentText()
 
-        arabic_days = {
-            "Sunday": "الأحد",
-            "Monday": "الاثنين",
-            "Tuesday": "الثلاثاء",
-            "Wednesday": "الأربعاء",
-            "Thursday": "الخميس",
-            "Friday": "الجمعة",
-            "Saturday": "السبت"
-        }
-
         if not client_id or not order_name or not order_type or not width or not length or not price_per_cm or not total_price:
             QMessageBox.warning(self, "خطأ في الإدخال", "يرجى ملء جميع الحقول.")
             return
@@ -192,38 +187,11 @@ class AddOrderDialog(QDialog):
             QMessageBox.warning(self, "خطأ في الإدخال", "يرجى إدخال أرقام صحيحة.")
             return
 
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        order_date_str = datetime.now().strftime("%d/%m/%Y")
-        order_day_str = datetime.now().strftime("%A")
-        arabic_day = arabic_days.get(order_day_str, "")
-        cursor.execute("""
-            INSERT INTO orders (order_name, client_id, width, length, price_per_cm, total_price, payment_type, order_type, order_date, order_day)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (order_name, client_id, width, length, price_per_cm, total_price, payment_type, order_type, order_date_str, arabic_day))
-        # Update total bill
-        cursor.execute("UPDATE clients SET total_bill = total_bill + ? WHERE id = ?", (total_price, client_id))
-        # For cash orders, insert a payment record
-        if payment_type == "نقدًا":
-            cursor.execute("""
-                INSERT INTO payments (client_id, payment_date, payment_day, amount_paid) 
-                VALUES (?, ?, ?, ?)
-            """, (client_id, order_date_str, arabic_day, total_price))
-            # Update paid_amount without changing owed_amount
-            cursor.execute("""
-                UPDATE clients 
-                SET paid_amount = paid_amount + ?
-                WHERE id = ?
-            """, (total_price, client_id))
-        else:
-            # For installment, update owed_amount
-            cursor.execute("""
-                UPDATE clients 
-                SET owed_amount = owed_amount + ?
-                WHERE id = ?
-            """, (total_price, client_id))
-        conn.commit()
-        conn.close()
-
-        QMessageBox.information(self, "نجاح", "تم إضافة الطلب بنجاح.")
-        self.close()
\ No newline at end of file
+        try:
+            # Client balances and the cash payment record are handled in one transaction
+            operations.add_order(client_id, order_name, order_type, width, length, price_per_cm, total_price, payment_type)
+
+            QMessageBox.information(self, "نجاح", "تم إضافة الطلب بنجاح.")
+            self.close()
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل إضافة الطلب: {e}")
\ No newline at end of file
@@ -2,8 +2,11 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QComboBox, QLineEdit, QPushButton, QMessageBox
 )
 from PyQt6.QtCore import Qt
-import sqlite3
-from datetime import datetime
+
+import client_directory
+import operations
+from models import client_list_model
+from widgets import ClientSearchBox
 
 class AddPaymentDialog(QDialog):
     def __init__(self, parent):
@@ -28,6 +31,10 @@ class AddPaymentDialog(QDialog):
             border-radius: 5px;
         """)
         self.layout.addWidget(self.client_label)
+        # Type-ahead search picks the client in the combo box
+        self.client_search = ClientSearchBox()
+        self.client_search.client_selected.connect(self.select_client)
+        self.layout.addWidget(self.client_search)
         self.layout.addWidget(self.client_combobox)
 
         # Client info
@@ -67,27 +74,21 @@ class AddPaymentDialog(QDialog):
         self.client_combobox.currentIndexChanged.connect(self.update_client_info)
 
     def populate_clients(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM clients")
-        clients = cursor.fetchall()
-        conn.close()
-        for client in clients:
-            self.client_combobox.addItem(client[1], client[0])
+        # Shared list, read from the database only when clients changed
+        self.client_combobox.setModel(client_list_model())
+
+    def select_client(self, client_id):
+        self.client_combobox.setCurrentIndex(client_directory.index_of(client_id))
 
     def update_client_info(self):
         client_id = self.client_combobox.currentData()
         try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT name, owed_amount FROM clients WHERE id = ?", (client_id,))
-            client = cursor.fetchone()
-            conn.close()
+            client = client_directory.read_client(client_id)
             if client:
-                self.client_info.setText(f"المبلغ المستحق: {client[1]:.2f}")
+                self.client_info.setText(f"المبلغ المستحق: {client[3]:.2f}")
             else:
                 self.client_info.setText("")
-        except sqlite3.Error as e:
+        except operations.ERRORS as e:
             QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب معلومات العميل: {e}")
             self.client_info.setText("")
 
@@ -95,16 +96,6 @@ class AddPaymentDialog(QDialog):
         client_id = self.client_combobox.currentData()
         amount_paid = self.amount_input.text()
 
-        arabic_days = {
-            "Sunday": "الأحد",
-            "Monday": "الاثنين",
-            "Tuesday": "الثلاثاء",
-            "Wednesday": "الأربعاء",
-            "Thursday": "الخميس",
-            "Friday": "الجمعة",
-            "Saturday": "السبت"
-        }
-
         if not client_id or not amount_paid:
             QMessageBox.warning(self, "خطأ في الإدخال", "يرجى اختيار العميل وإدخال المبلغ المدفوع.")
             return
@@ -116,37 +107,10 @@ class AddPaymentDialog(QDialog):
             return
 
         try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT owed_amount FROM clients WHERE id = ?", (client_id,))
-            owed = cursor.fetchone()[0]
-            if amount_paid > owed:
-                QMessageBox.warning(self, "خطأ في الإدخال", "لا يمكن أن يتجاوز المبلغ المدفوع المبلغ المستحق.")
-                conn.close()
-                return
-
-            payment_date_str = datetime.now().strftime("%d/%m/%Y")
-            payment_day_str = datetime.now().strftime("%A")
-            arabic_day = arabic_days.get(payment_day_str, "")
-            cursor.execute("""
-                INSERT INTO payments (client_id, payment_date, payment_day, amount_paid) 
-                VALUES (?, ?, ?, ?)
-            """, (client_id, payment_date_str, arabic_day, amount_paid))
-            cursor.execute("UPDATE clients SET paid_amount = paid_amount + ? WHERE id = ?", (amount_paid, client_id))
-            cursor.execute("UPDATE clients SET owed_amount = owed_amount - ? WHERE id = ?", (amount_paid, client_id))
-            # Ensure owed_amount is not negative
-            cursor.execute("""
-                UPDATE clients 
-                SET owed_amount = CASE 
-                                    WHEN owed_amount < 0 THEN 0
-                                    ELSE owed_amount
-                                  END
-                WHERE id = ?
-            """, (client_id,))
-            conn.commit()
-            conn.close()
-
+            operations.add_payment(client_id, amount_paid)
             QMessageBox.information(self, "نجاح", "الدفعة أضيفت بنجاح.")
             self.close()
-        except sqlite3.Error as e:
+        except operations.BalanceError:
+            QMessageBox.warning(self, "خطأ في الإدخال", "لا يمكن أن يتجاوز المبلغ المدفوع المبلغ المستحق.")
+        except operations.ERRORS as e:
             QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل إضافة الدفعة: {e}")
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""Flat CSV / Parquet export of clients, orders and payments for analysis.
+
+Orders and payments are split into one partition per month of their ISO
+date (rows without a valid date go to month=unknown), laid out as
+
+    <export dir>/orders/month=2024-03/part-0.csv
+    <export dir>/orders/month=2024-03/part-0.parquet
+
+Partitions are written in parallel by a process pool. Each worker opens its
+own read-only connection and streams its rows FETCH_SIZE at a time, so a
+full-history export uses every core without holding a table in memory.
+Parquet needs pyarrow; CSV has no extra dependency.
+"""
+import csv
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import database
+import dates
+
+FORMATS = ("csv", "parquet")
+FETCH_SIZE = 5000
+UNKNOWN_MONTH = "unknown"
+
+# Table -> ISO date column it is partitioned on (None: written as a single partition)
+TABLES = {"clients": None, "orders": "order_date_iso", "payments": "payment_date_iso"}
+
+
+def check_formats(formats):
+    """Raise ValueError / ImportError up front rather than in every worker."""
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+    if "parquet" in formats:
+        import pyarrow  # noqa: F401  (Parquet export needs pyarrow installed)
+
+
+def _partitions(conn, table, date_column):
+    if date_column is None:
+        return [None]
+    # DISTINCT months come straight from the date index
+    months = [row[0] for row in conn.execute(f"""
+        SELECT DISTINCT substr({date_column}, 1, 7) FROM {table} WHERE {date_column} IS NOT NULL
+    """)]
+    if conn.execute(f"SELECT 1 FROM {table} WHERE {date_column} IS NULL LIMIT 1").fetchone():
+        months.append(UNKNOWN_MONTH)
+    return months
+
+
+def _partition_query(table, date_column, month):
+    if month is None:
+        return f"SELECT * FROM {table} ORDER BY id", ()
+    if month == UNKNOWN_MONTH:
+        return f"SELECT * FROM {table} WHERE {date_column} IS NULL ORDER BY id", ()
+    year, month_number = map(int, month.split("-"))
+    return (f"SELECT * FROM {table} WHERE {date_column} >= ? AND {date_column} < ? ORDER BY {date_column}, id",
+            dates.month_range(year, month_number))
+
+
+def _column_types(conn, table):
+    """{column: declared SQLite type}, used to give Parquet files a fixed schema."""
+    return {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _parquet_schema(columns, types):
+    import pyarrow as pa
+    mapping = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+    return pa.schema([(column, mapping.get(types.get(column), pa.string())) for column in columns])
+
+
+def export_partition(db_path, out_dir, table, month, formats):
+    """Worker: write one partition of one table; returns (table, month, row count)."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        sql, params = _partition_query(table, TABLES[table], month)
+        cursor = conn.execute(sql, params)
+        columns = [desc[0] for desc in cursor.description]
+        folder = os.path.join(out_dir, table) if month is None else os.path.join(out_dir, table, f"month={month}")
+        os.makedirs(folder, exist_ok=True)
+
+        csv_file = csv_writer = parquet_writer = None
+        if "csv" in formats:
+            # utf-8-sig so Excel opens the Arabic text correctly
+            csv_file = open(os.path.join(folder, "part-0.csv"), "w", newline="", encoding="utf-8-sig")
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(columns)
+        if "parquet" in formats:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = _parquet_schema(columns, _column_types(conn, table))
+            parquet_writer = pq.ParquetWriter(os.path.join(folder, "part-0.parquet"), schema)
+
+        count = 0
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                count += len(rows)
+                if csv_writer:
+                    csv_writer.writerows(rows)
+                if parquet_writer:
+                    # One row group per chunk
+                    arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+                    parquet_writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        finally:
+            if csv_file:
+                csv_file.close()
+            if parquet_writer:
+                parquet_writer.close()
+        return table, month, count
+    finally:
+        conn.close()
+
+
+def export_tables(out_dir, formats=FORMATS, workers=None, progress=None):
+    """Export every table into a new folder inside out_dir and return its path.
+
+    workers defaults to one process per core. progress(done, total) is called
+    as partitions complete and may raise to cancel; the half-written folder is
+    then removed.
+    """
+    formats = tuple(formats)
+    check_formats(formats)
+    db_path = os.path.abspath(database.DB_PATH)
+    conn = database.get_connection()
+    tasks = [(table, month) for table, date_column in TABLES.items()
+             for month in _partitions(conn, table, date_column)]
+
+    target = os.path.join(out_dir, datetime.now().strftime("analytics_%Y%m%d_%H%M%S"))
+    staging = target + ".part"
+    os.makedirs(staging)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(export_partition, db_path, staging, table, month, formats)
+                       for table, month in tasks]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress:
+                        progress(done, len(futures))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
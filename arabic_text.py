@@ -0,0 +1,42 @@
+"""Folding of Arabic spellings so searches match however a name was typed.
+
+normalize() and normalize_sql() apply the same replacements, one in Python
+for search input and one in SQL for the triggers that index client names.
+"""
+
+# Harakat, tanween, shadda, sukun, dagger alef and tatweel are dropped
+_REMOVED = [chr(code) for code in range(0x064B, 0x0653)] + ["ٰ", "ـ"]
+
+_REPLACED = [
+    ("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"),  # alef with hamza / madda / wasla
+    ("ة", "ه"),  # taa marbuta
+    ("ى", "ي"),  # alef maksura
+    ("ؤ", "و"), ("ئ", "ي"),  # hamza on waw / yaa
+]
+
+REPLACEMENTS = [(char, "") for char in _REMOVED] + _REPLACED
+
+
+# SQLite's lower() only folds ASCII, which covers the Latin names in use
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def normalize(text):
+    """ASCII-lowercased text with Arabic spelling variants folded and runs of spaces shortened.
+
+    Mirrors normalize_sql() step for step, so a typed name compares equal to
+    the indexed one.
+    """
+    text = (text or "").translate(_ASCII_LOWER)
+    for old, new in REPLACEMENTS:
+        text = text.replace(old, new)
+    return text.replace("  ", " ").replace("  ", " ").strip(" ")
+
+
+def normalize_sql(expression):
+    """SQL version of normalize() for an expression such as NEW.name."""
+    sql = f"lower(coalesce({expression}, ''))"
+    for old, new in REPLACEMENTS:
+        sql = f"replace({sql}, '{old}', '{new}')"
+    # SQLite has no regex; two passes collapse runs of up to four spaces
+    return f"trim(replace(replace({sql}, '  ', ' '), '  ', ' '))"
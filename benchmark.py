@@ -0,0 +1,281 @@
+"""Headless benchmarks of what users wait for in each dialog.
+
+    python benchmark.py run --sizes small medium --repeat 20 --out results.json
+    python benchmark.py compare baseline.json results.json --threshold 0.2
+
+run generates (once, into --data-dir) a database per size with
+generate_data, then times every case in CASES against it. Each case runs in
+its own offscreen Qt process, so its peak RSS is its own and one case's
+caches don't warm the next. Cases that write get a fresh copy of the
+database. compare exits with status 1 if any case got slower or bigger than
+the threshold allows.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import generate_data
+
+# Regressions smaller than these are noise, whatever the relative change
+MIN_DELTA = {"p50_ms": 2.0, "p90_ms": 2.0, "peak_rss_mb": 5.0}
+
+
+def _busiest_client(database):
+    return database.fetch_one("""
+        SELECT client_id FROM orders GROUP BY client_id ORDER BY COUNT(*) DESC LIMIT 1
+    """)[0]
+
+
+# Each case is (setup, action, writes): setup(state) puts what the action needs into
+# the state dict outside the timing; action(state, i) is the part that gets timed.
+
+def _wait_for_queries(app):
+    """Dialogs load on query_executor threads; a case ends when their results are shown."""
+    import query_executor
+    app.processEvents()
+    while query_executor.pending():
+        time.sleep(0.001)
+        app.processEvents()
+
+
+def _open(dialog_path):
+    def action(state, i):
+        module_name, class_name = dialog_path.rsplit(".", 1)
+        dialog = getattr(__import__(module_name), class_name)(None)
+        _wait_for_queries(state["app"])
+        dialog.close()
+    return action
+
+
+def _setup_client_records(state):
+    from client_records import ClientRecordsDialog
+    import client_directory
+    import database
+    state["dialog"] = ClientRecordsDialog(None)
+    state["index"] = client_directory.index_of(_busiest_client(database))
+
+
+def _select_client(state, i):
+    # Alternate between the busiest client and the first one so every run changes the selection
+    combobox = state["dialog"].client_combobox
+    combobox.setCurrentIndex(state["index"] if combobox.currentIndex() != state["index"] else 0)
+    _wait_for_queries(state["app"])
+
+
+def _setup_financials(state):
+    from financials import FinancialsDialog
+    state["dialog"] = FinancialsDialog(None)
+
+
+def _switch_month(state, i):
+    combobox = state["dialog"].month_combobox
+    combobox.setCurrentIndex((combobox.currentIndex() + 1) % combobox.count())
+    _wait_for_queries(state["app"])
+
+
+def _save_order(state, i):
+    from add_order import AddOrderDialog
+    import client_directory
+    dialog = AddOrderDialog(None)
+    dialog.client_combobox.setCurrentIndex(client_directory.index_of(state["client_id"]))
+    dialog.order_name_input.setText("لافتة")
+    dialog.order_type_input.setText("بنر")
+    dialog.width_input.setText("100")
+    dialog.length_input.setText("200")
+    dialog.price_per_cm_input.setText("0.02")
+    dialog.payment_type_combobox.setCurrentIndex(i % 2)
+    dialog.save_order()
+
+
+def _save_payment(state, i):
+    from add_payment import AddPaymentDialog
+    import client_directory
+    dialog = AddPaymentDialog(None)
+    dialog.client_combobox.setCurrentIndex(client_directory.index_of(state["client_id"]))
+    dialog.amount_input.setText("1")
+    dialog.handle_save_payment()
+
+
+def _setup_writes(state):
+    import database
+    # The client owing the most, so repeated small payments never exceed the balance
+    state["client_id"] = database.fetch_one("SELECT id FROM clients ORDER BY owed_amount DESC LIMIT 1")[0]
+
+
+def _export_excel(state, i):
+    import export
+    export.export_workbook(os.path.join(state["tmp"], "export.xlsx"))
+
+
+CASES = {
+    "open_edit_order": (None, _open("edit_order.EditOrderDialog"), False),
+    "open_edit_payment": (None, _open("edit_payment.EditPaymentDialog"), False),
+    "open_view_clients": (None, _open("view_clients.ViewClientsDialog"), False),
+    "open_client_records": (None, _open("client_records.ClientRecordsDialog"), False),
+    "client_records_select": (_setup_client_records, _select_client, False),
+    "financials_switch_month": (_setup_financials, _switch_month, False),
+    "save_order": (_setup_writes, _save_order, True),
+    "save_payment": (_setup_writes, _save_payment, True),
+    "export_excel": (None, _export_excel, False),
+}
+# Cases too slow to repeat as often as the others
+MAX_REPEAT = {"export_excel": 3}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_case(db_path, case, repeat):
+    """Worker side: time one case in this process and return its statistics."""
+    from PyQt6.QtWidgets import QApplication, QMessageBox
+    import database
+
+    app = QApplication.instance() or QApplication([])
+    # Dialogs confirm saves with modal message boxes, which would wait for a click forever
+    for name in ("information", "warning", "critical", "question"):
+        setattr(QMessageBox, name, staticmethod(lambda *args, **kwargs: QMessageBox.StandardButton.Yes))
+
+    database.set_database_path(db_path)
+    setup, action, _ = CASES[case]
+    with tempfile.TemporaryDirectory() as tmp:
+        state = {"app": app, "tmp": tmp}
+        if setup:
+            setup(state)
+        samples = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            action(state, i)
+            samples.append((time.perf_counter() - started) * 1000)
+    import query_executor
+    query_executor.shutdown()
+    database.close_all()
+    return {
+        "runs": len(samples),
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": _percentile(samples, 0.5),
+        "p90_ms": _percentile(samples, 0.9),
+        "p99_ms": _percentile(samples, 0.99),
+        "max_ms": max(samples),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _dataset(data_dir, size, seed):
+    path = os.path.join(data_dir, f"{size}-seed{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {path}...", file=sys.stderr)
+        clients, orders, payments = generate_data.PROFILES[size]
+        generate_data.generate(path, clients, orders, payments, seed, log=lambda message: None)
+        # generate() leaves the pooled connection pointing at the new file
+        import database
+        database.close_all()
+    return path
+
+
+def run(args):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    results = {}
+    for size in args.sizes:
+        db_path = _dataset(args.data_dir, size, args.seed)
+        results[size] = {}
+        for case in args.cases or CASES:
+            repeat = min(args.repeat, MAX_REPEAT.get(case, args.repeat))
+            with tempfile.TemporaryDirectory() as tmp:
+                case_db = db_path
+                if CASES[case][2]:
+                    case_db = os.path.join(tmp, os.path.basename(db_path))
+                    shutil.copyfile(db_path, case_db)
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "_worker", case_db, case, str(repeat)],
+                    env=env, check=True, capture_output=True, text=True).stdout
+            results[size][case] = json.loads(output.strip().splitlines()[-1])
+            stats = results[size][case]
+            print(f"{size:<8}{case:<26}p50 {stats['p50_ms']:9.1f} ms  p90 {stats['p90_ms']:9.1f} ms"
+                  f"  rss {stats['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}", file=sys.stderr)
+    return 0
+
+
+def compare(args):
+    """Exit status 1 if a metric in new grew by more than threshold (and MIN_DELTA) over baseline."""
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+
+    regressions = 0
+    for size, cases in new.items():
+        for case, stats in cases.items():
+            old = baseline.get(size, {}).get(case)
+            if old is None:
+                continue
+            for metric, min_delta in MIN_DELTA.items():
+                before, after = old[metric], stats[metric]
+                change = (after - before) / before if before else 0
+                regressed = change > args.threshold and after - before > min_delta
+                regressions += regressed
+                print(f"{'REGRESSION' if regressed else 'ok':<11}{size:<8}{case:<26}{metric:<12}"
+                      f"{before:10.1f} -> {after:10.1f}  ({change:+.0%})")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_worker"]:
+        db_path, case, repeat = argv[1:4]
+        print(json.dumps(run_case(db_path, case, int(repeat))))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark the dialogs' data paths.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="time every case and write a JSON report")
+    run_parser.add_argument("--sizes", nargs="+", choices=generate_data.PROFILES, default=["small"])
+    run_parser.add_argument("--cases", nargs="+", choices=CASES)
+    run_parser.add_argument("--repeat", type=int, default=10)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "business_bench"),
+                            help="where generated databases are kept between runs")
+    run_parser.add_argument("--out", default="benchmark.json")
+    run_parser.set_defaults(run=run)
+    compare_parser = commands.add_parser("compare", help="compare two reports and fail on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative growth (0.2 = 20%%)")
+    compare_parser.set_defaults(run=compare)
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
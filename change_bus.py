@@ -0,0 +1,87 @@
+"""Application-wide notifications of committed writes.
+
+Once enable()d, every connection the process opens gets TEMP triggers that
+note each inserted, updated or deleted client, order and payment in a
+temporary change_log table. database.transaction() calls flush() after
+COMMIT, which hands the committed rows to subscribers as ChangeEvents. A
+rolled-back transaction takes its log rows with it, so only committed
+changes are ever published. Balance updates made by the migration 5
+triggers show up as client updates too.
+
+Changes committed by other processes can't be seen this way; the GUI polls
+PRAGMA data_version for those (models.ChangeNotifier) and publishes
+RELOAD, after which listeners refresh everything they show.
+"""
+import threading
+from collections import namedtuple
+
+# table is "clients", "orders" or "payments"; action "insert", "update" or "delete"
+ChangeEvent = namedtuple("ChangeEvent", "table action row_id client_id")
+RELOAD = ChangeEvent(None, "reload", None, None)
+
+enabled = False
+_subscribers = []
+_lock = threading.Lock()
+
+# table -> expression for the client a row belongs to
+_CLIENT_COLUMNS = {"clients": "id", "orders": "client_id", "payments": "client_id"}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def subscribe(callback):
+    """callback(event) is called on the thread that committed the change."""
+    with _lock:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def publish(event):
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        callback(event)
+
+
+def install(conn):
+    """Add the change_log table and its triggers to conn (they live only as long as the connection)."""
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS change_log (
+            table_name TEXT NOT NULL,
+            action TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            client_id INTEGER
+        )
+    """)
+    for table, client_column in _CLIENT_COLUMNS.items():
+        for action, event, row in (("insert", "INSERT", "NEW"), ("update", "UPDATE", "NEW"),
+                                   ("delete", "DELETE", "OLD")):
+            conn.execute(f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS trg_change_log_{table}_{action}
+                AFTER {event} ON main.{table}
+                BEGIN
+                    INSERT INTO change_log VALUES ('{table}', '{action}', {row}.id, {row}.{client_column});
+                END
+            """)
+
+
+def flush(conn):
+    """Publish what conn has logged since the last flush; call outside any transaction."""
+    rows = conn.execute("SELECT table_name, action, row_id, client_id FROM temp.change_log ORDER BY rowid").fetchall()
+    if not rows:
+        return
+    conn.execute("DELETE FROM temp.change_log")
+    seen = set()
+    for row in rows:
+        # A client whose balance moves several times in one transaction is one update
+        if row not in seen:
+            seen.add(row)
+            publish(ChangeEvent(*row))
@@ -0,0 +1,154 @@
+"""Command-line entry point for jobs that run without a display.
+
+    python -m cli create-db
+    python -m cli export excel clients.xlsx
+    python -m cli export analytics exports/ --format csv --workers 4
+    python -m cli summary 2024 [--month 3]
+    python -m cli check [--fix-revenue]
+    python -m cli generate big.db --profile large --seed 1
+    python -m cli serve [--port 8765]
+
+Nothing here imports Qt; the export modules are only imported by the
+commands that need them. Every command accepts --db to use another file,
+and --sql-log FILE to time its SQL, log the slow statements to FILE and
+print per-statement totals to stderr at the end.
+"""
+import argparse
+import sys
+
+import database
+import migrations
+import query_log
+import reports
+
+
+def create_db(args):
+    conn = database.get_connection()
+    print(f"Database ready at {database.DB_PATH} (schema version {migrations.get_version(conn)}).")
+    return 0
+
+
+def export_data(args):
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    if args.kind == "excel":
+        import export
+        export.export_workbook(args.target, progress)
+        path = args.target
+    else:
+        import analytics_export
+        path = analytics_export.export_tables(args.target, args.format or analytics_export.FORMATS,
+                                              workers=args.workers, progress=progress)
+    print(file=sys.stderr)
+    print(f"Exported to {path}")
+    return 0
+
+
+def summary(args):
+    if args.month:
+        rows = reports.monthly_revenue(args.year, args.month)
+    else:
+        rows = reports.yearly_revenue(args.year)
+    for period, total in rows:
+        print(f"{period}\t{total:.2f}")
+    print(f"Total\t{sum(total for _, total in rows):.2f}")
+    return 0
+
+
+def check(args):
+    """Exit status 1 if any client balance or daily revenue total is inconsistent."""
+    problems = 0
+    for client_id, name, paid, owed, total_bill in reports.balance_mismatches():
+        print(f"Client {client_id} ({name}): paid {paid:.2f} + owed {owed:.2f} != bill {total_bill:.2f}")
+        problems += 1
+    revenue = reports.revenue_mismatches()
+    for day, rollup, actual in revenue:
+        print(f"Revenue {day}: rollup {rollup} != payments {actual}")
+        problems += 1
+    if revenue and args.fix_revenue:
+        print(f"Rebuilt daily revenue for {reports.rebuild_daily_revenue()} days.")
+        problems -= len(revenue)
+    if not problems:
+        print("Balances and revenue totals are consistent.")
+    return 1 if problems else 0
+
+
+def generate(args):
+    import generate_data
+    clients, orders, payments = generate_data.PROFILES[args.profile]
+    generate_data.generate(args.path, args.clients or clients, args.orders or orders,
+                           args.payments or payments, args.seed)
+    return 0
+
+
+def serve(args):
+    import service
+    service.serve(port=args.port)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help=f"database file (default {database.DB_PATH})")
+    parser.add_argument("--shared", action="store_true",
+                        help="shared mode for several desks on one file (WAL, retried writes)")
+    parser.add_argument("--sql-log", metavar="FILE", help="time every SQL statement and log the slow ones to FILE")
+    parser.add_argument("--slow-ms", type=float, default=query_log.SLOW_QUERY_MS,
+                        help=f"slow-query threshold in ms (default {query_log.SLOW_QUERY_MS:g})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("create-db", help="create or upgrade the database").set_defaults(run=create_db)
+
+    export_parser = commands.add_parser("export", help="export to Excel or to CSV/Parquet")
+    export_parser.add_argument("kind", choices=["excel", "analytics"])
+    export_parser.add_argument("target", help="xlsx file (excel) or parent folder (analytics)")
+    export_parser.add_argument("--format", action="append", choices=["csv", "parquet"],
+                               help="analytics formats (repeatable; default both)")
+    export_parser.add_argument("--workers", type=int, help="analytics worker processes (default: one per core)")
+    export_parser.set_defaults(run=export_data)
+
+    summary_parser = commands.add_parser("summary", help="revenue per month of a year, or per day of a month")
+    summary_parser.add_argument("year", type=int)
+    summary_parser.add_argument("--month", type=int, choices=range(1, 13), metavar="1-12")
+    summary_parser.set_defaults(run=summary)
+
+    check_parser = commands.add_parser("check", help="verify client balances and the daily revenue rollup")
+    check_parser.add_argument("--fix-revenue", action="store_true", help="rebuild the rollup if it is off")
+    check_parser.set_defaults(run=check)
+
+    generate_parser = commands.add_parser("generate", help="create a database filled with synthetic data")
+    generate_parser.add_argument("path", help="database file to create")
+    generate_parser.add_argument("--profile", choices=["small", "medium", "large"], default="small")
+    generate_parser.add_argument("--clients", type=int)
+    generate_parser.add_argument("--orders", type=int)
+    generate_parser.add_argument("--payments", type=int)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.set_defaults(run=generate)
+
+    serve_parser = commands.add_parser("serve", help="run the local JSON service (localhost only)")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.set_defaults(run=serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        database.set_database_path(args.db)
+    if args.shared:
+        database.set_shared_mode(True)
+    if args.sql_log:
+        query_log.enable(args.sql_log, args.slow_ms)
+    try:
+        return args.run(args)
+    finally:
+        database.close_all()
+        if args.sql_log:
+            query_log.log_stats()
+            print(query_log.format_stats(), file=sys.stderr)
+            query_log.disable()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Process-wide list of client ids and names used by the client pickers,
+and the name search behind the type-ahead boxes.
+
+The list is read once and kept as two parallel arrays. change_counters
+(migration 7) is bumped by triggers whenever a client is added, renamed or
+deleted from any connection or process, so checking changed() costs one
+primary-key lookup and the names are only read again after a real change.
+Changes committed by this process are applied in place with insert(),
+remove() and rename(), which keep the loaded version in step. Thin clients
+(service_client.URL) read the list and the version from the service, and
+search the names in memory.
+"""
+from array import array
+from bisect import bisect_left
+
+import database
+import service_client
+from arabic_text import normalize
+
+# Matches offered per keystroke by the client search box
+SEARCH_LIMIT = 20
+
+_ids = array('q')
+_names = []
+_positions = {}  # client id -> index into _ids / _names
+_version = None
+_normalized = None  # normalize()d names, built only if search() has to scan in memory
+_search_index = {}  # database path -> whether it has the client_search FTS table
+
+
+def _current_version():
+    if service_client.URL:
+        return service_client.URL, service_client.get("/changes")["clients"]
+    row = database.fetch_one("SELECT version FROM change_counters WHERE name = 'clients'")
+    # Keyed on the path too, so switching database files never reuses the old list
+    return database.DB_PATH, row[0] if row else 0
+
+
+def changed():
+    """True if clients were added, renamed or deleted since the list was loaded."""
+    return _current_version() != _version
+
+
+def load():
+    global _ids, _names, _positions, _version, _normalized
+    _version = _current_version()
+    if service_client.URL:
+        rows = [(client["id"], client["name"]) for client in service_client.get("/clients")]
+    else:
+        rows = database.fetch_all("SELECT id, name FROM clients ORDER BY id")
+    _ids = array('q', (row[0] for row in rows))
+    _names = [row[1] for row in rows]
+    _positions = {client_id: i for i, client_id in enumerate(_ids)}
+    _normalized = None
+
+
+def count():
+    return len(_ids)
+
+
+def client_id(index):
+    return _ids[index]
+
+
+def name(index):
+    return _names[index]
+
+
+def index_of(client_id):
+    """Position of a client in the list, or -1 if it is not there."""
+    return _positions.get(client_id, -1)
+
+
+def insertion_index(client_id):
+    """Where a new client goes in the list, which is ordered by id."""
+    return bisect_left(_ids, client_id)
+
+
+def insert(index, client_id, name):
+    _ids.insert(index, client_id)
+    _names.insert(index, name)
+    _applied(reindex=True)
+
+
+def remove(index):
+    del _ids[index]
+    del _names[index]
+    _applied(reindex=True)
+
+
+def rename(index, name):
+    _names[index] = name
+    _applied()
+
+
+def note_change():
+    """Count a client insert or delete that was undone again before it could be applied."""
+    _applied()
+
+
+def _applied(reindex=False):
+    """Account for one change counter bump applied in place, so changed() stays False."""
+    global _positions, _version, _normalized
+    if reindex:
+        _positions = {client_id: i for i, client_id in enumerate(_ids)}
+    _normalized = None
+    if _version is not None:
+        _version = (_version[0], _version[1] + 1)
+
+
+def _has_search_index():
+    if service_client.URL:
+        return False
+    if database.DB_PATH not in _search_index:
+        row = database.fetch_one("SELECT 1 FROM sqlite_master WHERE name = 'client_search'")
+        _search_index[database.DB_PATH] = row is not None
+    return _search_index[database.DB_PATH]
+
+
+def search(text, limit=SEARCH_LIMIT):
+    """(id, name) of clients whose name contains text: exact, then prefix, then shortest matches.
+
+    Spelling variants are folded on both sides (see arabic_text), so "احمد"
+    finds "أحمد".
+    """
+    query = normalize(text)
+    if not query:
+        return []
+    if not _has_search_index():
+        return _search_loaded(query, limit)
+    if len(query) < 3:
+        # Too short for a trigram; match the start of the name instead
+        pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return database.fetch_all("""
+            SELECT clients.id, clients.name
+            FROM client_search
+            JOIN clients ON clients.id = client_search.rowid
+            WHERE client_search.name LIKE ? ESCAPE '\\'
+            LIMIT ?
+        """, (pattern, limit))
+    return database.fetch_all("""
+        SELECT clients.id, clients.name
+        FROM client_search
+        JOIN clients ON clients.id = client_search.rowid
+        WHERE client_search MATCH ?
+        ORDER BY client_search.name = ? DESC, substr(client_search.name, 1, ?) = ? DESC,
+                 length(client_search.name)
+        LIMIT ?
+    """, ('"' + query.replace('"', '""') + '"', query, len(query), query, limit))
+
+
+def read_client(client_id):
+    """(id, name, paid_amount, owed_amount, total_bill) of one client, or None."""
+    if service_client.URL:
+        return service_client.get_row(f"/clients/{client_id}")
+    return database.fetch_one("SELECT id, name, paid_amount, owed_amount, total_bill FROM clients WHERE id = ?",
+                              (client_id,))
+
+
+def _search_loaded(query, limit):
+    """search() for databases without the FTS table: scan the names already in memory."""
+    global _normalized
+    if _normalized is None:
+        _normalized = [normalize(name) for name in _names]
+    matches = [i for i, name in enumerate(_normalized) if query in name]
+    matches.sort(key=lambda i: (_normalized[i] != query, not _normalized[i].startswith(query), len(_normalized[i])))
+    return [(_ids[i], _names[i]) for i in matches[:limit]]
@@ -1,20 +1,26 @@
 import logging
 import sqlite3
 import traceback
-from datetime import datetime
 
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (
-    QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QMessageBox, QHBoxLayout, QComboBox, QLabel,
+    QDialog, QVBoxLayout, QTableView, QPushButton, QMessageBox, QHBoxLayout, QComboBox, QLabel,
     QAbstractItemView
 )
 
-from constants import arabic_days
+import query_executor
+import records_cache
+import service_client
+from models import ClientOrdersModel, ClientPaymentsModel, client_list_model, follow_changes
 
 #from main import resource_path
 
 
+# Clients either side of the selected one whose records are read ahead, for arrowing through the list
+PREFETCH_DISTANCE = 2
+
+
 class ClientRecordsDialog(QDialog):
     def __init__(self, parent):
         try:
@@ -55,7 +61,7 @@ class ClientRecordsDialog(QDialog):
             self.orders_label = QLabel("الطلبات:")
             self.orders_label.setStyleSheet("font-size: 16px; font-weight: bold; margin-top: 20px;")
             self.layout.addWidget(self.orders_label)
-            self.orders_table = QTableWidget()
+            self.orders_table = QTableView()
             self.orders_table.setStyleSheet("""
                 background-color: #ffffff;
                 color: #000000;
@@ -81,7 +87,7 @@ class ClientRecordsDialog(QDialog):
             self.payments_label = QLabel("المدفوعات:")
             self.payments_label.setStyleSheet("font-size: 16px; font-weight: bold; margin-top: 20px;")
             self.layout.addWidget(self.payments_label)
-            self.payments_table = QTableWidget()
+            self.payments_table = QTableView()
             self.payments_table.setStyleSheet("""
                 background-color: #ffffff;
                 color: #000000;
@@ -121,6 +127,18 @@ class ClientRecordsDialog(QDialog):
 
             self.setLayout(self.layout)
 
+            # Records are loaded off the GUI thread; a newer selection cancels the load in progress
+            self.records_query = query_executor.LatestQuery()
+            self.prefetch_queries = {}  # client_id -> QueryRequest reading it into records_cache
+            self.summary_query = query_executor.LatestQuery()
+            self.finished.connect(self.summary_query.cancel)
+            self.orders_model = None
+            self.payments_model = None
+            self.finished.connect(self.records_query.cancel)
+            self.finished.connect(self.cancel_prefetch)
+            # Reload the shown client when something of theirs is saved anywhere in the application
+            follow_changes(self, self.apply_change)
+
             # Populate clients
             self.populate_clients()
 
@@ -136,13 +154,8 @@ class ClientRecordsDialog(QDialog):
 
     def populate_clients(self):
         try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM clients")
-            clients = cursor.fetchall()
-            conn.close()
-            for client in clients:
-                self.client_combobox.addItem(client[1], client[0])
+            # Shared list, read from the database only when clients changed
+            self.client_combobox.setModel(client_list_model())
         except sqlite3.Error as e:
             logging.error(f"Database connection error: {e}\n{traceback.format_exc()}")
             QMessageBox.critical(self, "خطأ", f"خطأ في الاتصال بقاعدة البيانات: {e}")
@@ -153,100 +166,103 @@ class ClientRecordsDialog(QDialog):
         if client_id is None:
             QMessageBox.warning(self, "تحذير", "لم يتم تحديد عميل.")
             return
-        try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT name, paid_amount, owed_amount, total_bill FROM clients WHERE id = ?", (client_id,))
-            client = cursor.fetchone()
-            conn.close()
-            if client:
-                self.client_info.setText(f"الاسم: {client[0]}, المدفوع: {client[1]}, المستحق: {client[2]}, إجمالي الفاتورة: {client[3]}")
-            else:
-                self.client_info.setText("")
-        except sqlite3.Error as e:
-            logging.error(f"Error fetching client info: {e}\n{traceback.format_exc()}")
-            QMessageBox.critical(self, "خطأ", f"خطأ في جلب معلومات العميل: {e}")
+        self.prefetch_neighbours()
+        self.summary_query.cancel()
+        records = records_cache.get(client_id)
+        if records is not None:
+            # Already read (or prefetched): no query, no loading state
+            self.records_query.cancel()
+            self.show_client_records(records)
+            return
+        self.client_info.setText("جارٍ التحميل...")
+        self.orders_table.setEnabled(False)
+        self.payments_table.setEnabled(False)
+        request = self.records_query.submit(records_cache.load, client_id)
+        request.finished.connect(self.show_client_records)
+        request.failed.connect(self.show_load_error)
+
+    def prefetch_neighbours(self):
+        """Read the clients next to the selected one into records_cache in the background."""
+        if service_client.URL:
+            return  # Nothing is cached in thin-client mode
+        index = self.client_combobox.currentIndex()
+        wanted = set()
+        for i in range(index - PREFETCH_DISTANCE, index + PREFETCH_DISTANCE + 1):
+            client_id = self.client_combobox.itemData(i) if i != index and 0 <= i < self.client_combobox.count() else None
+            if client_id is not None and records_cache.get(client_id) is None:
+                wanted.add(client_id)
+        for client_id, request in list(self.prefetch_queries.items()):
+            if request.done or client_id not in wanted:
+                # Delivered, or no longer next to the selection
+                request.cancel()
+                del self.prefetch_queries[client_id]
+        for client_id in wanted - set(self.prefetch_queries):
+            self.prefetch_queries[client_id] = query_executor.submit(
+                records_cache.load, client_id, priority=query_executor.PREFETCH_PRIORITY)
+
+    def cancel_prefetch(self):
+        for request in self.prefetch_queries.values():
+            request.cancel()
+        self.prefetch_queries.clear()
+
+    def show_client_records(self, records):
+        summary, orders, payments = records
+        client_id = self.client_combobox.currentData()
+        self.show_summary(summary)
+        self.orders_model = self.set_table_model(self.orders_table, ClientOrdersModel(client_id, orders, self))
+        self.payments_model = self.set_table_model(self.payments_table, ClientPaymentsModel(client_id, payments, self))
+        self.orders_table.setEnabled(True)
+        self.payments_table.setEnabled(True)
+
+    def show_summary(self, summary):
+        if summary:
+            name, paid, owed, total_bill, order_count, payment_count = summary
+            self.client_info.setText(f"الاسم: {name}, المدفوع: {paid}, المستحق: {owed}, إجمالي الفاتورة: {total_bill}, "
+                                     f"عدد الطلبات: {order_count}, عدد المدفوعات: {payment_count}")
+        else:
             self.client_info.setText("")
 
-        self.populate_orders(client_id)
-        self.populate_payments(client_id)
+    def show_load_error(self, message):
+        logging.error(f"Error loading client records: {message}")
+        QMessageBox.critical(self, "خطأ", f"خطأ في جلب سجلات العميل: {message}")
+        self.client_info.setText("")
+        self.orders_model = self.set_table_model(self.orders_table, None)
+        self.payments_model = self.set_table_model(self.payments_table, None)
+        self.orders_table.setEnabled(True)
+        self.payments_table.setEnabled(True)
 
-    def populate_orders(self, client_id):
-        try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT orders.id, orders.order_name, orders.order_type, orders.width, orders.length, orders.price_per_cm, orders.total_price, orders.payment_type, orders.order_date, orders.order_day
-                FROM orders
-                WHERE client_id = ?
-            """, (client_id,))
-            orders = cursor.fetchall()
-            conn.close()
-
-            self.orders_table.clear()
-            self.orders_table.setRowCount(len(orders))
-            self.orders_table.setColumnCount(9)  # orders.id removed, order_day added
-            self.orders_table.setHorizontalHeaderLabels(["اسم الطلب", "نوع الطلب", "العرض (سم)", "الطول (سم)", "السعر لكل سم", "إجمالي السعر", "نوع الدفع", "تاريخ الطلب", "اليوم"])
-
-            for i, order in enumerate(orders):
-                for j in range(9):
-                    if j == 8:
-                        # Format the date and include the Arabic day
-                        date_str = order[j+1]
-                        try:
-                            date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-                            arabic_day = arabic_days.get(date_obj.strftime("%A"), "")
-                            self.orders_table.setItem(i, j, QTableWidgetItem(f"{date_str} ({arabic_day})"))
-                        except ValueError as e:
-                            logging.debug(f"Error parsing date {date_str}: {e}")
-                            self.orders_table.setItem(i, j, QTableWidgetItem(date_str))
-                    else:
-                        self.orders_table.setItem(i, j, QTableWidgetItem(str(order[j+1])))
-            self.orders_table.resizeColumnsToContents()  # Autofit columns
-            self.orders_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        except sqlite3.Error as e:
-            logging.error(f"Error populating orders: {e}\n{traceback.format_exc()}")
-            QMessageBox.critical(self, "خطأ", f"خطأ في جلب الطلبات: {e}")
-            self.orders_table.clear()
+    def set_table_model(self, table, model):
+        """Show model (orders or payments) in table; the rest of its rows are fetched as the table scrolls."""
+        old_model = table.model()
+        table.setModel(model)
+        if old_model is not None:
+            old_model.deleteLater()
+        if model is not None:
+            # Autofit columns to the first page instead of every row
+            table.horizontalHeader().setResizeContentsPrecision(model.BATCH_SIZE)
+            table.resizeColumnsToContents()
+        return model
 
-    def populate_payments(self, client_id):
-        try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT payments.payment_date, payments.payment_day, payments.amount_paid
-                FROM payments
-                WHERE client_id = ?
-            """, (client_id,))
-            payments = cursor.fetchall()
-            conn.close()
-
-            self.payments_table.clear()
-            self.payments_table.setRowCount(len(payments))
-            self.payments_table.setColumnCount(3)  # payment_date, payment_day, amount_paid
-            self.payments_table.setHorizontalHeaderLabels(["تاريخ الدفع", "يوم الدفع", "المبلغ المدفوع"])
-
-            for i, payment in enumerate(payments):
-                for j in range(3):
-                    if j == 0:
-                        # Payment date
-                        self.payments_table.setItem(i, j, QTableWidgetItem(payment[0]))
-                    elif j == 1:
-                        # Payment day in Arabic
-                        self.payments_table.setItem(i, j, QTableWidgetItem(payment[1]))
-                    elif j == 2:
-                        # Amount paid
-                        self.payments_table.setItem(i, 2, QTableWidgetItem(f"{payment[2]:.2f}"))
-            self.payments_table.resizeColumnsToContents()  # Autofit columns
-            self.payments_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        except sqlite3.Error as e:
-            logging.error(f"Error populating payments: {e}\n{traceback.format_exc()}")
-            QMessageBox.critical(self, "خطأ", f"خطأ في جلب المدفوعات: {e}")
-            self.payments_table.clear()
+    def apply_change(self, event):
+        client_id = self.client_combobox.currentData()
+        if client_id is None:
+            return
+        if event.action == "reload":
+            self.update_client_info_and_tables()
+            return
+        # Rows change in place, so someone deep in a long history keeps their place
+        for model in (self.orders_model, self.payments_model):
+            if model is not None and model.client_id == client_id:
+                model.apply_change(event)
+        if event.client_id == client_id:
+            request = self.summary_query.submit(records_cache.read_summary, client_id)
+            request.finished.connect(self.show_summary)
 
     def populate_records(self):
         client_id = self.client_combobox.currentData()
         if client_id is None:
             QMessageBox.warning(self, "تحذير", "لم يتم تحديد عميل.")
             return
+        # Refresh means read it again, not show the cached copy
+        records_cache.invalidate(client_id)
         self.update_client_info_and_tables()
\ No newline at end of file
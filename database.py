@@ -0,0 +1,206 @@
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import change_bus
+import migrations
+import query_log
+import service_client
+
+# Path of the database file shared by every dialog
+DB_PATH = 'business.db'
+
+# Number of compiled statements each connection keeps around for reuse
+STATEMENT_CACHE_SIZE = 256
+
+# Shared mode, for several desks on one database file (BUSINESS_SHARED_DB=1 or set_shared_mode()):
+# WAL so readers and the writer don't block each other, and a shorter busy wait
+# so the write retries below take over. WAL needs every desk's process on the
+# machine that holds the file; over a network share set BUSINESS_JOURNAL_MODE=DELETE.
+SHARED_MODE = os.environ.get("BUSINESS_SHARED_DB") == "1"
+SHARED_JOURNAL_MODE = os.environ.get("BUSINESS_JOURNAL_MODE", "WAL")
+BUSY_TIMEOUT = 5.0  # Seconds a statement waits on a lock before "database is locked"
+SHARED_BUSY_TIMEOUT = 1.0
+
+# Write transactions that still find the database locked are retried this many
+# times, waiting WRITE_RETRY_DELAY, then twice as long each time (with jitter)
+WRITE_RETRIES = 6
+WRITE_RETRY_DELAY = 0.05
+
+# True in service.py, which owns the file even while service_client.URL points at it (service.py check);
+# any other process with service_client.URL set is a thin client and must not open the file
+SERVICE = False
+
+_local = threading.local()
+_lock = threading.Lock()
+_connections = []  # Every open connection, so they can all be closed on exit
+_migrated = set()  # Database paths this process has already brought up to date
+_generation = 0  # Bumped by close_all(), which closes other threads' connections under them
+
+
+def _apply_pragmas(conn):
+    """Per-connection settings applied once when the connection is opened."""
+    conn.execute("PRAGMA cache_size = -16000")  # 16 MB page cache kept warm between clicks
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 67108864")  # 64 MB memory-mapped reads
+    if SHARED_MODE:
+        conn.execute(f"PRAGMA journal_mode = {SHARED_JOURNAL_MODE}")
+
+
+def set_shared_mode(enabled, journal_mode=None):
+    """Switch shared (multi-desk) mode on or off; reconnects on the next query."""
+    global SHARED_MODE, SHARED_JOURNAL_MODE
+    close_all()
+    SHARED_MODE = enabled
+    if journal_mode:
+        SHARED_JOURNAL_MODE = journal_mode
+
+
+def set_database_path(path):
+    """Point the pool at another database file and drop the old connections."""
+    global DB_PATH
+    close_all()
+    DB_PATH = path
+
+
+def get_connection():
+    """Return the long-lived connection owned by the calling thread."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation != _generation:
+        conn = _local.conn = None  # Already closed by close_all()
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+    if conn is not None:
+        close_connection()
+    if service_client.URL and not SERVICE:
+        raise RuntimeError(f"Thin client of {service_client.URL}: the database file is only opened by the service")
+
+    # isolation_level=None: statements autocommit unless wrapped in transaction()
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           timeout=SHARED_BUSY_TIMEOUT if SHARED_MODE else BUSY_TIMEOUT)
+    _apply_pragmas(conn)
+    if DB_PATH not in _migrated:
+        # Upgrades older business.db files in place the first time they are opened
+        migrations.migrate(conn)
+        _migrated.add(DB_PATH)
+    if change_bus.enabled:
+        change_bus.install(conn)
+    _local.conn = conn
+    _local.path = DB_PATH
+    with _lock:
+        _local.generation = _generation
+        _connections.append(conn)
+    return conn
+
+
+def close_connection():
+    """Close the calling thread's connection (used by worker threads when they finish)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+
+def close_all():
+    """Close every pooled connection, e.g. when the application quits."""
+    global _generation
+    with _lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.conn = None
+
+
+def execute(sql, params=()):
+    """Run a single statement and return its cursor (for rowcount / lastrowid)."""
+    if query_log.enabled:
+        return query_log.run(get_connection(), "execute", sql, params)
+    return get_connection().execute(sql, params)
+
+
+def executemany(sql, seq_of_params):
+    if query_log.enabled:
+        return query_log.run(get_connection(), "executemany", sql, seq_of_params)
+    return get_connection().executemany(sql, seq_of_params)
+
+
+def fetch_all(sql, params=()):
+    if query_log.enabled:
+        return query_log.run(get_connection(), "fetch_all", sql, params)
+    return get_connection().execute(sql, params).fetchall()
+
+
+def fetch_one(sql, params=()):
+    if query_log.enabled:
+        return query_log.run(get_connection(), "fetch_one", sql, params)
+    return get_connection().execute(sql, params).fetchone()
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Group the statements of one write path into a single transaction.
+
+    Nested use joins the outer transaction instead of starting a new one.
+    immediate takes the write lock up front (BEGIN IMMEDIATE), so a locked
+    database fails at the start rather than halfway through.
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    if change_bus.enabled:
+        change_bus.flush(conn)
+
+
+def _is_locked(error):
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+def run_write(function, *args, **kwargs):
+    """Run function in a BEGIN IMMEDIATE transaction, retrying with backoff while the database is locked.
+
+    Inside an outer transaction it just runs; the outer write path does the retrying.
+    """
+    if get_connection().in_transaction:
+        return function(*args, **kwargs)
+    delay = WRITE_RETRY_DELAY
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            with transaction(immediate=True):
+                return function(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e) or attempt == WRITE_RETRIES:
+                raise
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        delay *= 2
+
+
+def write(function):
+    """Decorator for the write paths in operations.py: each call is one retried run_write()."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return run_write(function, *args, **kwargs)
+    return wrapper
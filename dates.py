@@ -0,0 +1,32 @@
+from datetime import date, datetime
+
+from constants import arabic_days
+
+# Dates are shown and typed as dd/mm/yyyy; the *_date_iso columns hold yyyy-mm-dd so SQLite can sort and range-filter them
+DISPLAY_FORMAT = "%d/%m/%Y"
+
+
+def to_iso(display_date):
+    """'05/03/2024' -> '2024-03-05', or None when the text is not a valid date."""
+    if not display_date:
+        return None
+    try:
+        return datetime.strptime(display_date.strip(), DISPLAY_FORMAT).date().isoformat()
+    except ValueError:
+        return None
+
+
+def to_display(iso_date):
+    """'2024-03-05' -> '05/03/2024'."""
+    return date.fromisoformat(iso_date).strftime(DISPLAY_FORMAT)
+
+
+def arabic_day(iso_date):
+    return arabic_days.get(date.fromisoformat(iso_date).strftime("%A"), "")
+
+
+def month_range(year, month):
+    """First day of the month and first day of the next one, as ISO strings (end exclusive)."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
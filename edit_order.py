@@ -1,9 +1,19 @@
 from PyQt6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QMessageBox,
+    QDialog, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QMessageBox,
     QLabel, QLineEdit, QAbstractItemView, QComboBox
 )
 from PyQt6.QtCore import Qt
-import sqlite3
+
+import database
+import operations
+import service_client
+from models import OrdersTableModel, follow_changes
+
+def load_order(order_id):
+    """The orders row of order_id or None, from the service in thin-client mode."""
+    if service_client.URL:
+        return service_client.get_row(f"/orders/{order_id}")
+    return database.fetch_one("SELECT * FROM orders WHERE id = ?", (order_id,))
 
 class EditOrderDialog(QDialog):
     def __init__(self, parent, order_id=None):
@@ -19,8 +29,12 @@ class EditOrderDialog(QDialog):
         self.order_id = order_id
         self.layout = QVBoxLayout()
 
-        # Table widget
-        self.table = QTableWidget()
+        # Table view over a model that loads orders as the user scrolls
+        self.model = OrdersTableModel(order_id, self)
+        # Saves anywhere in the application update, add or remove just the rows they touch
+        follow_changes(self, self.model.apply_change)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setStyleSheet("""
             background-color: #ffffff;
             color: #000000;
@@ -38,8 +52,9 @@ class EditOrderDialog(QDialog):
         """)
         self.table.verticalHeader().setVisible(False)
         self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.layout.addWidget(self.table)
 
         # Buttons layout
@@ -80,84 +95,49 @@ class EditOrderDialog(QDialog):
         self.refresh_button.clicked.connect(self.populate_table)
 
     def populate_table(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        if self.order_id:
-            cursor.execute("""
-                SELECT orders.id, orders.order_name, orders.width, orders.length, orders.order_type, clients.name, orders.price_per_cm, orders.total_price, orders.payment_type, orders.order_date, orders.order_day
-                FROM orders 
-                JOIN clients ON orders.client_id = clients.id 
-                WHERE orders.id = ?
-            """, (self.order_id,))
-        else:
-            cursor.execute("""
-                SELECT orders.id, orders.order_name, orders.width, orders.length, orders.order_type, clients.name, orders.price_per_cm, orders.total_price, orders.payment_type, orders.order_date, orders.order_day
-                FROM orders
-                JOIN clients ON orders.client_id = clients.id
-            """)
-        orders = cursor.fetchall()
-        conn.close()
-
-        self.table.clear()
-        self.table.setRowCount(len(orders))
-        self.table.setColumnCount(11)  # Including ID column
-        self.table.setHorizontalHeaderLabels(["ID", "اسم الطلب", "العرض (سم)", "الطول (سم)", " نوع الطلب", "العميل","السعر لكل سم", "السعر الإجمالي", "نوع الدفع", "تاريخ الطلب", "اليوم"])
-
-        for i, order in enumerate(orders):
-            for j in range(11):
-                if j == 0:
-                    self.table.setItem(i, j, QTableWidgetItem(str(order[j])))  # ID
-                else:
-                    self.table.setItem(i, j, QTableWidgetItem(str(order[j])))
-        self.table.resizeColumnsToContents()  # Autofit columns
-        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.model.reload()
+        # Size the columns from the first batch only instead of every order
+        self.model.fetchMore()
+        self.table.horizontalHeader().setResizeContentsPrecision(OrdersTableModel.BATCH_SIZE)
+        self.table.resizeColumnsToContents()
+
+    def selected_order_id(self):
+        rows = self.table.selectionModel().selectedRows()
+        return self.model.row_id(rows[0].row()) if rows else None
 
     def edit_order(self):
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        order_id = self.selected_order_id()
+        if order_id is None:
             QMessageBox.warning(self, "تحذير", "لم يتم تحديد طلب.")
             return
 
-        order_id = int(selected_items[0].text())
         # Open a new dialog to edit the order
         dialog = EditOrderDialogEdit(self, order_id)
         dialog.exec()
 
     def delete_order(self):
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        order_id = self.selected_order_id()
+        if order_id is None:
             QMessageBox.warning(self, "تحذير", "لم يتم تحديد طلب.")
             return
 
-        order_id = int(selected_items[0].text())
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT total_price, client_id FROM orders WHERE id = ?", (order_id,))
-        order = cursor.fetchone()
+        try:
+            order = load_order(order_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب الطلب: {e}")
+            return
         if not order:
             QMessageBox.warning(self, "تحذير", "الطلب غير موجود.")
-            conn.close()
             return
 
-        total_price = order[0]
-        client_id = order[1]
         confirm = QMessageBox.question(self, "تأكيد الحذف", "هل أنت متأكد من حذف الطلب؟", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if confirm == QMessageBox.StandardButton.Yes:
-            # Update client's total_bill and owed_amount
-            cursor.execute("SELECT total_bill, owed_amount FROM clients WHERE id = ?", (client_id,))
-            client = cursor.fetchone()
-            if client:
-                old_total_bill = client[0]
-                old_owed_amount = client[1]
-                new_total_bill = old_total_bill - total_price
-                new_owed_amount = old_owed_amount - total_price
-                cursor.execute("UPDATE clients SET total_bill = ?, owed_amount = ? WHERE id = ?", (new_total_bill, new_owed_amount, client_id))
-            # Delete the order
-            cursor.execute("DELETE FROM orders WHERE id = ?", (order_id,))
-            conn.commit()
-            conn.close()
-            QMessageBox.information(self, "تم الحذف", "تم حذف الطلب بنجاح.")
-            self.populate_table()
+            try:
+                # The client's total_bill and owed_amount follow the delete
+                operations.delete_order(order_id)
+                QMessageBox.information(self, "تم الحذف", "تم حذف الطلب بنجاح.")
+            except operations.ERRORS as e:
+                QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل حذف الطلب: {e}")
 
 class EditOrderDialogEdit(QDialog):
     def __init__(self, parent, order_id):
@@ -243,11 +223,11 @@ class EditOrderDialogEdit(QDialog):
         self.cancel_button.clicked.connect(self.close)
 
     def populate_fields(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM orders WHERE id = ?", (self.order_id,))
-        order = cursor.fetchone()
-        conn.close()
+        try:
+            order = load_order(self.order_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب الطلب: {e}")
+            return
 
         if order:
             self.order_name_input.setText(order[1])  # order_name
@@ -261,54 +241,15 @@ class EditOrderDialogEdit(QDialog):
             ##self.order_day_input.setText(str(order[9]))   # order_day
 
     def save_order(self):
-        old_order = self.get_old_order()
         new_total_price = float(self.total_price_input.text())
 
-        if old_order:
-            old_total_price = old_order[0]
-            delta = new_total_price - old_total_price
-        else:
-            delta = new_total_price
-
-        # Update client's total_bill and owed_amount
-        client_id = self.get_client_id()
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT total_bill, owed_amount FROM clients WHERE id = ?", (client_id,))
-        client = cursor.fetchone()
-        if client:
-            old_total_bill = client[0]
-            old_owed_amount = client[1]
-            new_total_bill = old_total_bill + delta
-            new_owed_amount = old_owed_amount + delta
-            cursor.execute("UPDATE clients SET total_bill = ?, owed_amount = ? WHERE id = ?", (new_total_bill, new_owed_amount, client_id))
-        # Update the order
-        cursor.execute("""
-            UPDATE orders
-            SET order_name = ?, order_type = ?, width = ?, length = ?, price_per_cm = ?, total_price = ?, payment_type = ?
-            WHERE id = ?
-        """, (self.order_name_input.text(), self.order_type_input.text(),self.width_input.text(), self.length_input.text(), self.price_per_cm_input.text(), new_total_price, self.payment_type_input.currentText(), self.order_id))
-        conn.commit()
-        conn.close()
-        QMessageBox.information(self, "نجاح", "تم تعديل الطلب بنجاح.")
-        self.close()
-        self.parent().populate_table()
-
-    def get_old_order(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT total_price FROM orders WHERE id = ?", (self.order_id,))
-        order = cursor.fetchone()
-        conn.close()
-        return order
-
-    def get_client_id(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT client_id FROM orders WHERE id = ?", (self.order_id,))
-        client_id = cursor.fetchone()[0]
-        conn.close()
-        return client_id
+        try:
+            # The client's total_bill and owed_amount follow the new total
+            operations.update_order(self.order_id, self.order_name_input.text(), self.order_type_input.text(), self.width_input.text(), self.length_input.text(), self.price_per_cm_input.text(), new_total_price, self.payment_type_input.currentText())
+            QMessageBox.information(self, "نجاح", "تم تعديل الطلب بنجاح.")
+            self.close()
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل تعديل الطلب: {e}")
 
     def delete_order(self):
         selected_items = self.table.selectedItems()
@@ -317,34 +258,24 @@ class EditOrderDialogEdit(QDialog):
             return
 
         order_id = int(selected_items[0].text())
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT total_price, client_id FROM orders WHERE id = ?", (order_id,))
-        order = cursor.fetchone()
+        try:
+            order = load_order(order_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب الطلب: {e}")
+            return
         if not order:
             QMessageBox.warning(self, "تحذير", "الطلب المحدد غير موجود.")
-            conn.close()
             return
 
-        total_price = order[0]
-        client_id = order[1]
         confirm = QMessageBox.question(self, "تأكيد الحذف", "هل أنت متأكد من أنك تريد حذف هذا الطلب؟", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if confirm == QMessageBox.StandardButton.Yes:
-            # Update client's total_bill and owed_amount
-            cursor.execute("SELECT total_bill, owed_amount FROM clients WHERE id = ?", (client_id,))
-            client = cursor.fetchone()
-            if client:
-                old_total_bill = client[0]
-                old_owed_amount = client[1]
-                new_total_bill = old_total_bill - total_price
-                new_owed_amount = old_owed_amount - total_price
-                cursor.execute("UPDATE clients SET total_bill = ?, owed_amount = ? WHERE id = ?", (new_total_bill, new_owed_amount, client_id))
-            # Delete the order
-            cursor.execute("DELETE FROM orders WHERE id = ?", (order_id,))
-            conn.commit()
-            conn.close()
-            QMessageBox.information(self, "نجاح", "تم حذف الطلب بنجاح.")
-            self.populate_table()
+            try:
+                # The client's total_bill and owed_amount follow the delete
+                operations.delete_order(order_id)
+                QMessageBox.information(self, "نجاح", "تم حذف الطلب بنجاح.")
+                self.populate_table()
+            except operations.ERRORS as e:
+                QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل حذف الطلب: {e}")
 
 if __name__ == "__main__":
     import sys
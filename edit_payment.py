@@ -1,9 +1,22 @@
 from PyQt6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QMessageBox,
+    QDialog, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QMessageBox,
     QComboBox, QLabel, QLineEdit, QAbstractItemView
 )
 from PyQt6.QtCore import Qt
-import sqlite3
+
+import client_directory
+import database
+import dates
+import operations
+import service_client
+from models import PaymentsTableModel, client_list_model, follow_changes
+from widgets import ClientSearchBox
+
+def load_payment(payment_id):
+    """The payments row of payment_id or None, from the service in thin-client mode."""
+    if service_client.URL:
+        return service_client.get_row(f"/payments/{payment_id}")
+    return database.fetch_one("SELECT * FROM payments WHERE id = ?", (payment_id,))
 
 class EditPaymentDialog(QDialog):
     def __init__(self, parent, payment_id=None):
@@ -19,8 +32,44 @@ class EditPaymentDialog(QDialog):
         self.payment_id = payment_id
         self.layout = QVBoxLayout()
 
-        # Table widget
-        self.table = QTableWidget()
+        # Filters, applied by SQLite rather than over loaded rows
+        filters_layout = QHBoxLayout()
+        # Shared client list; no selection (index -1) means all clients
+        self.client_filter = QComboBox()
+        self.client_filter.setModel(client_list_model())
+        self.client_filter.setPlaceholderText("الكل")
+        self.client_filter.setCurrentIndex(-1)
+        self.date_from_input = QLineEdit()
+        self.date_from_input.setPlaceholderText("من تاريخ (dd/mm/yyyy)")
+        self.date_to_input = QLineEdit()
+        self.date_to_input.setPlaceholderText("إلى تاريخ (dd/mm/yyyy)")
+        self.amount_min_input = QLineEdit()
+        self.amount_min_input.setPlaceholderText("أقل مبلغ")
+        self.amount_max_input = QLineEdit()
+        self.amount_max_input.setPlaceholderText("أعلى مبلغ")
+        self.filter_button = QPushButton("تصفية")
+        self.clear_filters_button = QPushButton("مسح")
+        # Type-ahead search picks the client in the filter; emptying it goes back to all clients
+        self.client_search = ClientSearchBox()
+        self.client_search.client_selected.connect(self.select_client)
+        self.client_search.textEdited.connect(self.clear_client_if_empty)
+        filters_layout.addWidget(QLabel("العميل:"))
+        filters_layout.addWidget(self.client_search)
+        filters_layout.addWidget(self.client_filter)
+        filters_layout.addWidget(self.date_from_input)
+        filters_layout.addWidget(self.date_to_input)
+        filters_layout.addWidget(self.amount_min_input)
+        filters_layout.addWidget(self.amount_max_input)
+        filters_layout.addWidget(self.filter_button)
+        filters_layout.addWidget(self.clear_filters_button)
+        self.layout.addLayout(filters_layout)
+
+        # Table view over a model that sorts, filters and pages in SQLite
+        self.model = PaymentsTableModel(payment_id, self)
+        # Saves anywhere in the application update, add or remove just the rows they touch
+        follow_changes(self, self.model.apply_change)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setStyleSheet("""
             background-color: #ffffff;
             color: #000000;
@@ -38,8 +87,13 @@ class EditPaymentDialog(QDialog):
         """)
         self.table.verticalHeader().setVisible(False)
         self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        # Clicking a header re-queries in that order (ID, date and amount columns)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().sortIndicatorChanged.connect(self.keep_sort_indicator)
         self.layout.addWidget(self.table)
 
         # Buttons layout
@@ -78,86 +132,98 @@ class EditPaymentDialog(QDialog):
         self.edit_button.clicked.connect(self.edit_payment)
         self.delete_button.clicked.connect(self.delete_payment)
         self.refresh_button.clicked.connect(self.populate_table)
+        self.filter_button.clicked.connect(self.apply_filters)
+        self.clear_filters_button.clicked.connect(self.clear_filters)
 
     def populate_table(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        if self.payment_id:
-            cursor.execute("""
-                SELECT payments.id, clients.name, payments.payment_date, payments.payment_day, payments.amount_paid 
-                FROM payments
-                JOIN clients ON payments.client_id = clients.id
-                WHERE payments.id = ?
-            """, (self.payment_id,))
-        else:
-            cursor.execute("""
-                SELECT payments.id, clients.name, payments.payment_date, payments.payment_day, payments.amount_paid
-                FROM payments
-                JOIN clients ON payments.client_id = clients.id
-            """)
-        payments = cursor.fetchall()
-        conn.close()
-
-        self.table.clear()
-        self.table.setRowCount(len(payments))
-        self.table.setColumnCount(5)  # Including ID column
-        self.table.setHorizontalHeaderLabels(["ID", "العميل", "تاريخ الدفع", "يوم الدفع", "المبلغ المدفوع"])
-
-        for i, payment in enumerate(payments):
-            for j in range(5):
-                if j == 0:
-                    self.table.setItem(i, j, QTableWidgetItem(str(payment[j])))  # ID
-                else:
-                    self.table.setItem(i, j, QTableWidgetItem(str(payment[j])))
-        self.table.resizeColumnsToContents()  # Autofit columns
-        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.model.reload()
+        self.fit_columns()
+
+    def fit_columns(self):
+        # Size the columns from the first batch only instead of every payment
+        self.model.fetchMore()
+        self.table.horizontalHeader().setResizeContentsPrecision(PaymentsTableModel.BATCH_SIZE)
+        self.table.resizeColumnsToContents()
+
+    def keep_sort_indicator(self, column, order):
+        # The client and day columns can't be sorted; put the indicator back on the model's sort column
+        if column in PaymentsTableModel.SORT_COLUMNS:
+            return
+        header = self.table.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(self.model.sort_column,
+                                Qt.SortOrder.DescendingOrder if self.model.descending else Qt.SortOrder.AscendingOrder)
+        header.blockSignals(False)
+
+    def apply_filters(self):
+        date_from = self.date_from_input.text().strip()
+        date_to = self.date_to_input.text().strip()
+        if (date_from and not dates.to_iso(date_from)) or (date_to and not dates.to_iso(date_to)):
+            QMessageBox.warning(self, "خطأ", "يرجى إدخال التاريخ بصيغة dd/mm/yyyy.")
+            return
+        try:
+            amount_min = float(self.amount_min_input.text()) if self.amount_min_input.text().strip() else None
+            amount_max = float(self.amount_max_input.text()) if self.amount_max_input.text().strip() else None
+        except ValueError:
+            QMessageBox.warning(self, "خطأ", "يرجى إدخال مبلغ صحيح.")
+            return
+
+        self.model.set_filters(self.client_filter.currentData(), dates.to_iso(date_from), dates.to_iso(date_to),
+                               amount_min, amount_max)
+        # set_filters() has already reloaded the model
+        self.fit_columns()
+
+    def select_client(self, client_id):
+        self.client_filter.setCurrentIndex(client_directory.index_of(client_id))
+
+    def clear_client_if_empty(self, text):
+        if not text.strip():
+            self.client_filter.setCurrentIndex(-1)
+
+    def clear_filters(self):
+        self.client_filter.setCurrentIndex(-1)
+        self.client_search.clear()
+        for field in (self.date_from_input, self.date_to_input, self.amount_min_input, self.amount_max_input):
+            field.clear()
+        self.apply_filters()
+
+    def selected_payment_id(self):
+        rows = self.table.selectionModel().selectedRows()
+        return self.model.row_id(rows[0].row()) if rows else None
 
     def edit_payment(self):
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        payment_id = self.selected_payment_id()
+        if payment_id is None:
             QMessageBox.warning(self, "تحذير", "لم يتم تحديد دفعة.")
             return
 
-        payment_id = int(selected_items[0].text())
         # Open a new dialog to edit the payment
         dialog = EditPaymentDialogEdit(self, payment_id)
         dialog.exec()
 
     def delete_payment(self):
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        payment_id = self.selected_payment_id()
+        if payment_id is None:
             QMessageBox.warning(self, "تحذير", "لم يتم تحديد دفعة.")
             return
 
-        payment_id = int(selected_items[0].text())
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT amount_paid, client_id FROM payments WHERE id = ?", (payment_id,))
-        payment = cursor.fetchone()
+        try:
+            payment = load_payment(payment_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب الدفعة: {e}")
+            return
         if not payment:
             QMessageBox.warning(self, "تحذير", "الدفعة غير موجودة.")
-            conn.close()
             return
 
-        amount_paid = payment[0]
-        client_id = payment[1]
         confirm = QMessageBox.question(self, "تأكيد الحذف", "هل أنت متأكد من حذف الدفعة؟", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if confirm == QMessageBox.StandardButton.Yes:
-            # Update client's paid_amount and owed_amount
-            cursor.execute("SELECT paid_amount, owed_amount FROM clients WHERE id = ?", (client_id,))
-            client = cursor.fetchone()
-            if client:
-                old_paid_amount = client[0]
-                old_owed_amount = client[1]
-                new_paid_amount = old_paid_amount - amount_paid
-                new_owed_amount = old_owed_amount + amount_paid
-                cursor.execute("UPDATE clients SET paid_amount = ?, owed_amount = ? WHERE id = ?", (new_paid_amount, new_owed_amount, client_id))
-            # Delete the payment
-            cursor.execute("DELETE FROM payments WHERE id = ?", (payment_id,))
-            conn.commit()
-            conn.close()
-            QMessageBox.information(self, "تم الحذف", "تم حذف الدفعة بنجاح.")
-            self.populate_table()
+            try:
+                # The client's paid_amount and owed_amount follow the delete
+                operations.delete_payment(payment_id)
+                QMessageBox.information(self, "تم الحذف", "تم حذف الدفعة بنجاح.")
+            except operations.ERRORS as e:
+                QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل حذف الدفعة: {e}")
 
 class EditPaymentDialogEdit(QDialog):
     def __init__(self, parent, payment_id):
@@ -225,68 +291,33 @@ class EditPaymentDialogEdit(QDialog):
         self.cancel_button.clicked.connect(self.close)
 
     def populate_clients(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM clients")
-        clients = cursor.fetchall()
-        conn.close()
-        for client in clients:
-            self.client_combobox.addItem(client[1], client[0])
+        # Shared list, read from the database only when clients changed
+        self.client_combobox.setModel(client_list_model())
 
     def populate_fields(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM payments WHERE id = ?", (self.payment_id,))
-        payment = cursor.fetchone()
-        conn.close()
+        try:
+            payment = load_payment(self.payment_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب الدفعة: {e}")
+            return
 
         if payment:
-            self.client_combobox.setCurrentIndex(self.client_combobox.findData(payment[1]))  # client_id
+            self.client_combobox.setCurrentIndex(client_directory.index_of(payment[1]))  # client_id
             self.payment_date_input.setText(payment[2])       # payment_date
             self.payment_day_input.setText(str(payment[3]))  # payment_day (convert to string)
             self.amount_paid_input.setText(str(payment[4]))   # amount_paid
 
     def save_payment(self):
         client_id = self.client_combobox.currentData()
-        old_payment = self.get_old_payment()
         new_payment_amount = float(self.amount_paid_input.text())
 
-        if old_payment:
-            old_payment_amount = old_payment[0]
-            delta = new_payment_amount - old_payment_amount
-        else:
-            delta = new_payment_amount
-
-        # Update client's paid_amount and owed_amount
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT paid_amount, owed_amount FROM clients WHERE id = ?", (client_id,))
-        client = cursor.fetchone()
-        if client:
-            old_paid_amount = client[0]
-            old_owed_amount = client[1]
-            new_paid_amount = old_paid_amount + delta
-            new_owed_amount = old_owed_amount - delta
-            cursor.execute("UPDATE clients SET paid_amount = ?, owed_amount = ? WHERE id = ?", (new_paid_amount, new_owed_amount, client_id))
-        # Update the payment
-        cursor.execute("""
-            UPDATE payments
-            SET client_id = ?, payment_date = ?, payment_day = ?, amount_paid = ?
-            WHERE id = ?
-        """, (client_id, self.payment_date_input.text(), self.payment_day_input.text(), new_payment_amount, self.payment_id))
-        conn.commit()
-        conn.close()
-        QMessageBox.information(self, "نجاح", "تم تعديل الدفعة بنجاح.")
-        self.close()
-        self.parent().populate_table()
-
-    def get_old_payment(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT amount_paid FROM payments WHERE id = ?", (self.payment_id,))
-        payment = cursor.fetchone()
-        conn.close()
-        return payment
+        try:
+            # Balances of the old and (if changed) new client follow the edit
+            operations.update_payment(self.payment_id, client_id, self.payment_date_input.text(), self.payment_day_input.text(), new_payment_amount)
+            QMessageBox.information(self, "نجاح", "تم تعديل الدفعة بنجاح.")
+            self.close()
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل تعديل الدفعة: {e}")
 
     def delete_payment(self):
         selected_items = self.table.selectedItems()
@@ -295,34 +326,24 @@ class EditPaymentDialogEdit(QDialog):
             return
 
         payment_id = int(selected_items[0].text())
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT amount_paid, client_id FROM payments WHERE id = ?", (payment_id,))
-        payment = cursor.fetchone()
+        try:
+            payment = load_payment(payment_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب الدفعة: {e}")
+            return
         if not payment:
             QMessageBox.warning(self, "تحذير", "الدفعة المحددة غير موجودة.")
-            conn.close()
             return
 
-        amount_paid = payment[0]
-        client_id = payment[1]
         confirm = QMessageBox.question(self, "تأكيد الحذف", "هل أنت متأكد من أنك تريد حذف هذه الدفعة؟", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if confirm == QMessageBox.StandardButton.Yes:
-            # Update client's paid_amount and owed_amount
-            cursor.execute("SELECT paid_amount, owed_amount FROM clients WHERE id = ?", (client_id,))
-            client = cursor.fetchone()
-            if client:
-                old_paid_amount = client[0]
-                old_owed_amount = client[1]
-                new_paid_amount = old_paid_amount - amount_paid
-                new_owed_amount = old_owed_amount + amount_paid
-                cursor.execute("UPDATE clients SET paid_amount = ?, owed_amount = ? WHERE id = ?", (new_paid_amount, new_owed_amount, client_id))
-            # Delete the payment
-            cursor.execute("DELETE FROM payments WHERE id = ?", (payment_id,))
-            conn.commit()
-            conn.close()
-            QMessageBox.information(self, "نجاح", "تم حذف الدفعة بنجاح.")
-            self.populate_table()
+            try:
+                # The client's paid_amount and owed_amount follow the delete
+                operations.delete_payment(payment_id)
+                QMessageBox.information(self, "نجاح", "تم حذف الدفعة بنجاح.")
+                self.populate_table()
+            except operations.ERRORS as e:
+                QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل حذف الدفعة: {e}")
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+"""Keyset pages of the orders and payments editors (models.OrdersTableModel and
+models.PaymentsTableModel), kept free of Qt so that service.py can answer them
+for thin clients.
+
+The read_* functions read the database (service.py answers with them); the
+others ask the service instead when service_client.URL is set. Rows are tuples:
+
+    orders:   id, order_name, width, length, order_type, client name, price_per_cm,
+              total_price, payment_type, order_date, order_day, client_id
+    payments: id, client name, payment_date, payment_day, amount_paid,
+              payment_date_iso, client_id
+"""
+from urllib.parse import urlencode
+
+import database
+import service_client
+
+# Payments editor column -> SQL sort key; the client name and day columns can't be sorted from an index
+PAYMENT_SORT_KEYS = {0: "payments.id", 2: "payments.payment_date_iso", 4: "payments.amount_paid"}
+_AFTER_ALL = 2 ** 63 - 1  # Above every id, for the first page in descending order
+PAYMENT_FILTERS = (("client_id", "payments.client_id = ?"),
+                   ("date_from", "payments.payment_date_iso >= ?"),
+                   ("date_to", "payments.payment_date_iso <= ?"),
+                   ("amount_min", "payments.amount_paid >= ?"),
+                   ("amount_max", "payments.amount_paid <= ?"))
+
+
+def _get_rows(path, parameters):
+    query = urlencode({name: value for name, value in parameters.items() if value is not None})
+    return [tuple(row) for row in service_client.get(f"{path}?{query}")]
+
+
+def _select_orders(where, params, limit, order_id):
+    if order_id:
+        where += " AND orders.id = ?"
+        params = params + [order_id]
+    return database.fetch_all(f"""
+        SELECT orders.id, orders.order_name, orders.width, orders.length, orders.order_type, clients.name, orders.price_per_cm, orders.total_price, orders.payment_type, orders.order_date, orders.order_day, orders.client_id
+        FROM orders
+        JOIN clients ON orders.client_id = clients.id
+        WHERE {where}
+        ORDER BY orders.id
+        LIMIT ?
+    """, params + [limit])
+
+
+def read_orders(after_id, limit, order_id=None):
+    """Up to limit orders with an id above after_id (only order_id when it is given), by id."""
+    return _select_orders("orders.id > ?", [after_id], limit, order_id)
+
+
+def orders_after(after_id, limit, order_id=None):
+    if service_client.URL:
+        return _get_rows("/orders", {"after": after_id, "limit": limit, "order_id": order_id})
+    return read_orders(after_id, limit, order_id)
+
+
+def order_row(row_id, order_id=None):
+    """One order, or None."""
+    rows = orders_after(row_id - 1, 1, order_id)
+    return rows[0] if rows and rows[0][0] == row_id else None
+
+
+def _payment_conditions(filters, payment_id):
+    conditions, params = [], []
+    if payment_id:
+        conditions.append("payments.id = ?")
+        params.append(payment_id)
+    for key, condition in PAYMENT_FILTERS:
+        if filters.get(key) is not None:
+            conditions.append(condition)
+            params.append(filters[key])
+    return conditions, params
+
+
+def _select_payments(conditions, params, order_by, limit):
+    where = " AND ".join(conditions) or "1"
+    return database.fetch_all(f"""
+        SELECT payments.id, clients.name, payments.payment_date, payments.payment_day, payments.amount_paid, payments.payment_date_iso, payments.client_id
+        FROM payments
+        JOIN clients ON payments.client_id = clients.id
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT ?
+    """, params + [limit])
+
+
+def read_payments(filters, sort_column, descending, after, limit, payment_id=None):
+    """Up to limit payments passing filters, in sort_column order, following after.
+
+    after is None for the first page, else (id, sort value) of the last row
+    already loaded. filters is a dict with PAYMENT_FILTERS keys; dates are ISO
+    strings and both ends are inclusive.
+    """
+    conditions, params = _payment_conditions(filters, payment_id)
+    direction = "DESC" if descending else "ASC"
+    id_op = "<" if descending else ">"
+    key = PAYMENT_SORT_KEYS[sort_column]
+
+    if key == "payments.id":
+        # A rowid range even on the first page (as in the orders editor), so the plan is a SEARCH
+        conditions.append(f"payments.id {id_op} ?")
+        params.append(after[0] if after else (_AFTER_ALL if descending else 0))
+        return _select_payments(conditions, params, f"payments.id {direction}", limit)
+
+    # Rows with a NULL key are paged separately (they sort first ascending, last descending),
+    # which keeps the (key, id) row-value comparison a plain index range
+    last_key = after[1] if after else None
+    phases = ("value", "null") if descending else ("null", "value")
+    first_phase = 0 if after is None else phases.index("null" if last_key is None else "value")
+
+    rows = []
+    for phase in phases[first_phase:]:
+        resume_after = after if phase == phases[first_phase] else None
+        phase_conditions, phase_params = list(conditions), list(params)
+        if phase == "null":
+            phase_conditions.append(f"{key} IS NULL")
+            order_by = f"payments.id {direction}"
+            if resume_after:
+                phase_conditions.append(f"payments.id {id_op} ?")
+                phase_params.append(resume_after[0])
+        else:
+            phase_conditions.append(f"{key} IS NOT NULL")
+            order_by = f"{key} {direction}, payments.id {direction}"
+            if resume_after:
+                phase_conditions.append(f"({key}, payments.id) {id_op} (?, ?)")
+                phase_params += [last_key, resume_after[0]]
+        rows += _select_payments(phase_conditions, phase_params, order_by, limit - len(rows))
+        if len(rows) == limit:
+            break
+    return rows
+
+
+def payments_after(filters, sort_column, descending, after, limit, payment_id=None):
+    if service_client.URL:
+        parameters = dict(filters, sort=sort_column, descending=int(descending), limit=limit,
+                          payment_id=payment_id)
+        if after is not None:
+            parameters["after"], parameters["after_value"] = after
+        return _get_rows("/payments", parameters)
+    return read_payments(filters, sort_column, descending, after, limit, payment_id)
+
+
+def read_payment(row_id, filters, payment_id=None):
+    """Payment row_id if it passes filters, else None."""
+    conditions, params = _payment_conditions(filters, payment_id)
+    rows = _select_payments(conditions + ["payments.id = ?"], params + [row_id], "payments.id", 1)
+    return rows[0] if rows else None
+
+
+def payment_row(row_id, filters, payment_id=None):
+    if service_client.URL:
+        rows = _get_rows("/payments", dict(filters, row=row_id, payment_id=payment_id))
+        return rows[0] if rows else None
+    return read_payment(row_id, filters, payment_id)
@@ -0,0 +1,174 @@
+"""Excel export of every client with their orders and payments.
+
+Clients, orders and payments are each read in order of client, FETCH_SIZE
+rows per query, every query continuing from the key of the last row read
+(keyset paging). No cursor stays open between pages, so the export never holds
+a read lock the GUI's saves would have to wait for; a row saved meanwhile shows
+up if its page hasn't been read yet. The workbook is written in openpyxl's
+write-only mode, which streams each sheet to disk. Memory therefore stays flat
+however many clients and rows there are.
+
+The workbook is written next to the target as a .part file and only renamed
+over it once complete, so a failed or cancelled export never leaves a
+truncated file behind.
+"""
+import os
+import re
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+import database
+
+# Rows read per page query
+FETCH_SIZE = 2000
+_BEFORE_ALL = -2 ** 63  # Below every id, for the first page
+
+# Page queries: the key of the last row read, then the page size. client_id is nullable;
+# orphaned rows belong to no sheet (and NULL doesn't compare with an id)
+CLIENTS_PAGE = """
+    SELECT id, name, paid_amount, owed_amount, total_bill FROM clients
+    WHERE id > ? ORDER BY id LIMIT ?
+"""
+ORDERS_PAGE = """
+    SELECT * FROM orders
+    WHERE client_id IS NOT NULL AND (client_id, id) > (?, ?) ORDER BY client_id, id LIMIT ?
+"""
+PAYMENTS_PAGE = """
+    SELECT * FROM payments
+    WHERE client_id IS NOT NULL AND (client_id, id) > (?, ?) ORDER BY client_id, id LIMIT ?
+"""
+
+CLIENT_HEADERS = ["اسم العميل", "المبلغ المدفوع", "المبلغ المستحق", "إجمالي الفاتورة"]
+# Sheet layout: client info on rows 1-2, orders from row 4, payments two rows after the last order
+ORDERS_START_ROW = 3
+PAYMENTS_GAP = 3
+
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+class ExportCancelled(Exception):
+    """Raised from a progress callback to stop an export."""
+
+
+def _scan(sql, key_columns):
+    """(column names, row iterator) for a page query keyed on key_columns, read page by page."""
+    cursor = database.execute(sql, (_BEFORE_ALL,) * len(key_columns) + (FETCH_SIZE,))
+    columns = [desc[0] for desc in cursor.description]
+    key_indexes = [columns.index(column) for column in key_columns]
+    first_page = cursor.fetchall()
+
+    def rows():
+        page = first_page
+        while page:
+            yield from page
+            if len(page) < FETCH_SIZE:
+                return
+            page = database.fetch_all(sql, tuple(page[-1][i] for i in key_indexes) + (FETCH_SIZE,))
+    return columns, rows()
+
+
+class _GroupedRows:
+    """Rows of a scan ordered by client_id, handed out one client at a time."""
+
+    def __init__(self, sql, client_id_column="client_id"):
+        self.columns, self._rows = _scan(sql, (client_id_column, "id"))
+        self._client_index = self.columns.index(client_id_column)
+        self._next = next(self._rows, None)
+
+    def take(self, client_id):
+        """Yield the rows of client_id; rows of clients that no longer exist are skipped."""
+        while self._next is not None and self._next[self._client_index] < client_id:
+            self._next = next(self._rows, None)
+        while self._next is not None and self._next[self._client_index] == client_id:
+            yield self._next
+            self._next = next(self._rows, None)
+
+
+def _sheet_title(name, client_id, used):
+    """Excel sheet titles: at most 31 characters, no []:*?/\\ and unique (case-insensitive)."""
+    base = _INVALID_SHEET_CHARS.sub("_", (name or "").strip())[:25] or f"عميل {client_id}"
+    title, n = base, 2
+    while title.lower() in used:
+        title = f"{base[:25]} ({n})"
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def _header(sheet, values):
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    return cells
+
+
+def _pad(sheet, row, target_row):
+    while row < target_row:
+        sheet.append([])
+        row += 1
+    return row
+
+
+def export_workbook(file_path, progress=None):
+    """Write one sheet per client (details, then orders, then payments) to file_path.
+
+    progress(done, total) is called after each client; it may raise
+    ExportCancelled, in which case nothing is written.
+    """
+    temp_path = file_path + ".part"
+    try:
+        _write_workbook(temp_path, progress)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _write_workbook(file_path, progress):
+    total = database.fetch_one("SELECT COUNT(*) FROM clients")[0]
+    workbook = Workbook(write_only=True)
+    _, clients = _scan(CLIENTS_PAGE, ("id",))
+    orders = _GroupedRows(ORDERS_PAGE)
+    payments = _GroupedRows(PAYMENTS_PAGE)
+
+    used_titles = set()
+    for client_id, name, paid, owed, total_bill in clients:
+        sheet = workbook.create_sheet(_sheet_title(name, client_id, used_titles))
+        sheet.append(_header(sheet, CLIENT_HEADERS))
+        sheet.append([name, paid, owed, total_bill])
+        # Write-only sheets are filled top to bottom, so gaps are written as empty rows
+        row = 2
+
+        order_count = 0
+        for order in orders.take(client_id):
+            if order_count == 0:
+                row = _pad(sheet, row, ORDERS_START_ROW)
+                sheet.append(_header(sheet, orders.columns))
+                row += 1
+            sheet.append(list(order))
+            order_count += 1
+            row += 1
+
+        first_payment = True
+        for payment in payments.take(client_id):
+            if first_payment:
+                _pad(sheet, row, ORDERS_START_ROW + order_count + PAYMENTS_GAP)
+                sheet.append(_header(sheet, payments.columns))
+                first_payment = False
+            sheet.append(list(payment))
+
+        if progress:
+            progress(len(used_titles), total)
+
+    if not used_titles:
+        # A workbook needs at least one sheet
+        sheet = workbook.create_sheet("لا يوجد عملاء")
+        sheet.append(_header(sheet, ["ملاحظة"]))
+        sheet.append(["لا توجد بيانات متاحة"])
+    workbook.save(file_path)
+
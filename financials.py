@@ -4,9 +4,27 @@ from PyQt6.QtWidgets import (
     QAbstractItemView
 )
 from PyQt6.QtCore import Qt, QSize
-import sqlite3
 from datetime import datetime
 
+import dates
+import query_executor
+import reports
+import service_client
+from models import follow_changes
+
+
+def load_month(year, month):
+    """[(iso_date, total)] of one month, from the service in thin-client mode; runs on a query_executor thread."""
+    if service_client.URL:
+        return [(row["day"], row["total"]) for row in service_client.get(f"/financials/{year}/{month}")]
+    return reports.monthly_revenue(year, month)
+
+
+def load_years():
+    if service_client.URL:
+        return service_client.get("/financials/years")
+    return reports.payment_years()
+
 
 class FinancialsDialog(QDialog):
     def __init__(self, parent):
@@ -21,8 +39,21 @@ class FinancialsDialog(QDialog):
 
         self.layout = QVBoxLayout()
 
-        # Month selection
+        # Year and month selection
         self.filter_layout = QHBoxLayout()
+        self.year_label = QLabel("اختر السنة:")
+        self.year_label.setStyleSheet("font-size: 16px; font-weight: bold;")
+        self.year_combobox = QComboBox()
+        self.year_combobox.setStyleSheet("""
+            background-color: #ffffff;
+            color: #000000;
+            border: 1px solid #ccc;
+            border-radius: 5px;
+            padding: 5px;
+            font-size: 14px;
+        """)
+        self.filter_layout.addWidget(self.year_label)
+        self.filter_layout.addWidget(self.year_combobox)
         self.month_label = QLabel("اختر الشهر:")
         self.month_label.setStyleSheet("font-size: 16px; font-weight: bold;")
         self.month_combobox = QComboBox()
@@ -82,14 +113,35 @@ class FinancialsDialog(QDialog):
 
         self.setLayout(self.layout)
 
-        # Populate months
+        # Month totals are loaded off the GUI thread; switching again cancels the load in progress
+        self.month_query = query_executor.LatestQuery()
+        self.finished.connect(self.month_query.cancel)
+        # Payments saved anywhere in the application move the daily totals
+        follow_changes(self, self.apply_change)
+
+        # Populate years and months
+        self.populate_years()
         self.populate_months()
 
-        # Update financials when month is changed
+        # Update financials when year or month is changed
+        self.year_combobox.currentIndexChanged.connect(self.update_financials)
         self.month_combobox.currentIndexChanged.connect(self.update_financials)
 
         # Connect refresh button
-        self.refresh_button.clicked.connect(self.populate_months)
+        self.refresh_button.clicked.connect(self.refresh)
+
+        self.update_financials()
+
+    def populate_years(self):
+        selected_year = self.year_combobox.currentData() or datetime.now().year
+        years = sorted(set(load_years()) | {datetime.now().year})
+
+        self.year_combobox.blockSignals(True)
+        self.year_combobox.clear()
+        for year in years:
+            self.year_combobox.addItem(str(year), year)
+        self.year_combobox.setCurrentIndex(self.year_combobox.findData(selected_year))
+        self.year_combobox.blockSignals(False)
 
     def populate_months(self):
         # Arabic month names mapped to numbers
@@ -99,6 +151,7 @@ class FinancialsDialog(QDialog):
         }
 
         # Clear the combobox
+        self.month_combobox.blockSignals(True)
         self.month_combobox.clear()
 
         # Add all 12 months to the dropdown
@@ -109,34 +162,40 @@ class FinancialsDialog(QDialog):
         current_month = datetime.now().strftime("%m")
         current_month_index = list(arabic_months.keys()).index(current_month)
         self.month_combobox.setCurrentIndex(current_month_index)
+        self.month_combobox.blockSignals(False)
+
+    def apply_change(self, event):
+        if event.action == "reload":
+            self.refresh()
+        elif event.table == "payments":
+            self.update_financials()
+
+    def refresh(self):
+        self.populate_years()
+        self.update_financials()
 
     def update_financials(self):
+        selected_year = self.year_combobox.currentData()
+        selected_month_num = self.month_combobox.currentData()
+        if selected_year is None or selected_month_num is None:
+            return
+
+        self.financials_label.setText("المالية الشهرية (جارٍ التحميل...)")
+        self.financials_table.setEnabled(False)
+        # A range read of the daily_revenue rollup (kept by triggers); one row per day of the month
+        request = self.month_query.submit(load_month, selected_year, int(selected_month_num))
+        request.finished.connect(self.show_financials)
+        request.failed.connect(self.show_load_error)
+
+    def show_load_error(self, message):
+        self.financials_label.setText("المالية الشهرية")
+        self.financials_table.setEnabled(True)
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ: {message}")
+
+    def show_financials(self, daily_totals_list):
+        self.financials_label.setText("المالية الشهرية")
+        self.financials_table.setEnabled(True)
         try:
-            selected_month_num = self.month_combobox.currentData()
-            #if selected_month_num == None :
-            #    QMessageBox.warning(self, "خطأ في التحديد", "يرجى اختيار شهر صحيح.")
-            #    return
-
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT payment_date, payment_day, amount_paid FROM payments WHERE payment_date IS NOT NULL")
-            payments = cursor.fetchall()
-            conn.close()
-
-            daily_totals = {}
-            for payment in payments:
-                payment_date, payment_day, amount_paid = payment
-                try:
-                    date_obj = datetime.strptime(payment_date, "%d/%m/%Y")
-                    if date_obj.strftime("%m") == selected_month_num:
-                        if payment_date not in daily_totals:
-                            daily_totals[payment_date] = {"day": payment_day, "total": 0}
-                        daily_totals[payment_date]["total"] += amount_paid
-                except ValueError:
-                    continue
-
-            daily_totals_list = sorted(daily_totals.items(), key=lambda x: datetime.strptime(x[0], "%d/%m/%Y"))
-
             self.financials_table.clear()
             self.financials_table.setRowCount(0)  # Start with an empty table
             self.financials_table.setColumnCount(3)
@@ -145,8 +204,9 @@ class FinancialsDialog(QDialog):
             row_index = 0
             light_green = QColor(144, 238, 144)  # Light green color
 
-            for date, data in daily_totals_list:
-                if data["day"] == "السبت":
+            for date_iso, total in daily_totals_list:
+                day = dates.arabic_day(date_iso)
+                if day == "السبت":
                     # Insert an empty row before "السبت" and merge all columns
                     self.financials_table.insertRow(row_index)
                     self.financials_table.setSpan(row_index, 0, 1, 3)  # Merge all three columns
@@ -157,13 +217,13 @@ class FinancialsDialog(QDialog):
 
                 # Insert the actual data row
                 self.financials_table.insertRow(row_index)
-                self.financials_table.setItem(row_index, 0, QTableWidgetItem(date))
-                self.financials_table.setItem(row_index, 1, QTableWidgetItem(data["day"]))
-                self.financials_table.setItem(row_index, 2, QTableWidgetItem(f"{data['total']:.2f}"))
+                self.financials_table.setItem(row_index, 0, QTableWidgetItem(dates.to_display(date_iso)))
+                self.financials_table.setItem(row_index, 1, QTableWidgetItem(day))
+                self.financials_table.setItem(row_index, 2, QTableWidgetItem(f"{total:.2f}"))
                 row_index += 1
 
             # Add total row
-            grand_total = sum(data["total"] for data in daily_totals.values())
+            grand_total = sum(total for _, total in daily_totals_list)
             self.financials_table.insertRow(row_index)
             self.financials_table.setSpan(row_index, 0, 1, 2)  # Merge first two columns
             total_label = QTableWidgetItem("الإجمالي")
@@ -0,0 +1,241 @@
+"""Seeded synthetic data for testing the screens at realistic scale.
+
+    python generate_data.py large.db --profile large --seed 1
+
+The database is created through the same migrations as create_database.py.
+Rows are generated in Python and bulk inserted with executemany() in one
+transaction. Triggers and secondary indexes are dropped for the load and
+recreated afterwards. The data they maintain (ISO dates, client balances,
+daily revenue, the client search index) is then filled in with set-based
+SQL. The same seed and end date always produce the same database.
+"""
+import argparse
+import functools
+import math
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import database
+import migrations
+from arabic_text import normalize_sql
+from constants import arabic_days
+from operations import CASH, INSTALLMENT
+
+# name -> (clients, orders, payments)
+PROFILES = {
+    "small": (1_000, 20_000, 50_000),
+    "medium": (5_000, 200_000, 600_000),
+    "large": (10_000, 1_000_000, 3_000_000),
+}
+
+FIRST_NAMES = ["محمد", "أحمد", "محمود", "مصطفى", "علي", "حسن", "حسين", "إبراهيم", "يوسف", "عمر",
+               "خالد", "عبدالله", "عبدالرحمن", "سعيد", "طارق", "ياسر", "هشام", "كريم", "وليد", "سامي",
+               "فاطمة", "عائشة", "مريم", "خديجة", "زينب", "نور", "سارة", "هدى", "ليلى", "آمنة",
+               "رحمة", "إيمان", "أسماء", "هبة", "رانيا", "دعاء", "منى", "سلمى", "ياسمين", "شيماء"]
+FAMILY_NAMES = ["المصري", "الشامي", "السيد", "عبدالعزيز", "الحسيني", "النجار", "الخطيب", "الشريف",
+                "العطار", "الفقي", "الجمال", "البنا", "حسنين", "عثمان", "سليمان", "منصور", "القاضي",
+                "الدسوقي", "الزيات", "مؤمن", "الأنصاري", "رضوان", "عيسى", "الطحان", "القباني"]
+BUSINESS_WORDS = ["مطبعة", "مكتبة", "شركة", "مؤسسة", "معرض", "مركز", "صيدلية", "مطعم", "محلات"]
+ORDER_TYPES = ["بنر", "فليكس", "ستيكر", "لوحة", "كانفاس", "ورق حائط", "رول أب", "مش", "فوم", "بوستر"]
+ORDER_NAMES = ["لافتة محل", "إعلان", "واجهة", "دعاية انتخابية", "لوحة طريق", "خلفية معرض",
+               "ملصق سيارة", "ديكور", "قائمة طعام", "لافتة عيادة"]
+PRICES_PER_CM = [0.005, 0.01, 0.015, 0.02, 0.03, 0.05]
+
+CASH_SHARE = 0.4  # Share of orders paid in cash on the day
+FULLY_PAID_SHARE = 0.6  # Share of installment orders whose installments cover the whole price
+MAX_INSTALLMENT_DAYS = 180
+YEARS = 6  # History length
+END_DATE = date(2025, 12, 31)  # Fixed so the same seed gives the same rows on any day
+BATCH_SIZE = 50_000  # Rows per executemany() call
+
+
+def _calendar(end, years):
+    """(days, cumulative weights): busier Saturdays to Thursdays, quiet Fridays, steady growth."""
+    start = date(end.year - years, end.month, 1)
+    days, cumulative, total = [], [], 0.0
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        weight = 0.25 if day.weekday() == 4 else 1.0
+        weight *= 1 + offset / 365 * 0.15  # ~15% more orders each year
+        if day.month in (8, 9, 12):  # Back-to-school and year-end rush
+            weight *= 1.3
+        total += weight
+        days.append(day)
+        cumulative.append(total)
+    return days, cumulative
+
+
+@functools.lru_cache(maxsize=None)  # A few thousand distinct days, looked up millions of times
+def _day_fields(ordinal):
+    """(dd/mm/yyyy, yyyy-mm-dd, Arabic day name) for a date given as date.toordinal()."""
+    day = date.fromordinal(ordinal)
+    return day.strftime("%d/%m/%Y"), day.isoformat(), arabic_days[day.strftime("%A")]
+
+
+def _client_names(rng, count):
+    names = set()
+    while len(names) < count:
+        if rng.random() < 0.15:
+            name = f"{rng.choice(BUSINESS_WORDS)} {rng.choice(FAMILY_NAMES)}"
+        else:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES[:20])} {rng.choice(FAMILY_NAMES)}"
+        if name in names:
+            name = f"{name} {len(names)}"
+        names.add(name)
+    names = sorted(names)
+    rng.shuffle(names)
+    return names
+
+
+def _orders(rng, client_count, count, days, cumulative):
+    """Order rows in date order; a few regular clients place most of the orders."""
+    order_days = sorted(day.toordinal() for day in rng.choices(days, cum_weights=cumulative, k=count))
+    client_weights = [1 / (rank + 1) ** 0.8 for rank in range(client_count)]
+    # Each column is drawn in one choices() call, which is much faster than per-row randrange()
+    columns = zip(order_days,
+                  rng.choices(range(1, client_count + 1), weights=client_weights, k=count),
+                  rng.choices(range(20, 400, 10), k=count),
+                  rng.choices(range(20, 600, 10), k=count),
+                  rng.choices(PRICES_PER_CM, k=count),
+                  rng.choices([CASH, INSTALLMENT], weights=[CASH_SHARE, 1 - CASH_SHARE], k=count),
+                  rng.choices(ORDER_NAMES, k=count),
+                  rng.choices(ORDER_TYPES, k=count))
+    for ordinal, client_id, width, length, price_per_cm, payment_type, order_name, order_type in columns:
+        total_price = math.ceil(width * length * price_per_cm)  # Same formula as AddOrderDialog
+        display, iso, day_name = _day_fields(ordinal)
+        yield (order_name, client_id, width, length, price_per_cm, total_price,
+               payment_type, order_type, display, iso, day_name)
+
+
+def _payments(rng, orders, count, last_day):
+    """Payment rows in date order: one per cash order on its day, the rest spread as installments."""
+    ordinals = {}  # ISO date -> ordinal, for the few thousand distinct order days
+    payments = []  # (day ordinal, client id, amount)
+    installment_orders = []
+    for order in orders:
+        ordinal = ordinals.get(order[9])
+        if ordinal is None:
+            ordinal = ordinals[order[9]] = date.fromisoformat(order[9]).toordinal()
+        if order[6] == CASH:
+            payments.append((ordinal, order[1], order[5]))
+        else:
+            installment_orders.append((ordinal, order[1], order[5]))
+
+    installments = max(count - len(payments), 0)
+    per_order = [0] * len(installment_orders)
+    if installment_orders:
+        for index in rng.choices(range(len(installment_orders)), k=installments):
+            per_order[index] += 1
+
+    last_ordinal = last_day.toordinal()
+    for (ordinal, client_id, total_price), parts in zip(installment_orders, per_order):
+        if not parts:
+            continue
+        covered = 1.0 if rng.random() < FULLY_PAID_SHARE else rng.uniform(0.3, 0.9)
+        weights = [rng.random() + 0.5 for _ in range(parts)]
+        scale = total_price * covered / sum(weights)
+        offsets = sorted(int(rng.random() * MAX_INSTALLMENT_DAYS) for _ in range(parts))
+        for weight, offset in zip(weights, offsets):
+            # Rounded down to the piastre so installments never add up to more than the price
+            payments.append((min(ordinal + offset, last_ordinal), client_id, math.floor(weight * scale * 100) / 100))
+
+    payments.sort()
+    for ordinal, client_id, amount in payments:
+        display, iso, day_name = _day_fields(ordinal)
+        yield client_id, display, iso, day_name, amount
+
+
+def _insert(conn, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def _refresh_derived(conn):
+    """Fill in what the triggers would have maintained row by row (keep in step with migrations.py)."""
+    conn.execute("""
+        UPDATE clients SET
+            total_bill = COALESCE((SELECT SUM(total_price) FROM orders WHERE client_id = clients.id), 0),
+            paid_amount = COALESCE((SELECT SUM(amount_paid) FROM payments WHERE client_id = clients.id), 0)
+    """)
+    conn.execute("UPDATE clients SET owed_amount = total_bill - paid_amount")
+    migrations.rebuild_daily_revenue(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'client_search'").fetchone():
+        conn.execute("DELETE FROM client_search")
+        conn.execute(f"INSERT INTO client_search (rowid, name) SELECT id, {normalize_sql('name')} FROM clients")
+    conn.execute("UPDATE change_counters SET version = version + 1 WHERE name = 'clients'")
+
+
+def generate(path, clients, orders, payments, seed=0, end=END_DATE, log=print):
+    """Create path (which must not exist yet) and fill it with seeded synthetic data ending on end."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    database.set_database_path(path)
+    conn = database.get_connection()
+
+    # Triggers and secondary indexes are dropped for the load and recreated from their own SQL
+    saved = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('trigger', 'index') AND sql IS NOT NULL
+    """).fetchall()
+    with database.transaction():
+        for kind, name, _ in saved:
+            conn.execute(f"DROP {kind.upper()} {name}")
+
+        _insert(conn, "INSERT INTO clients (name, paid_amount, owed_amount, total_bill) VALUES (?, 0, 0, 0)",
+                ((name,) for name in _client_names(rng, clients)))
+        log(f"clients: {clients} ({time.perf_counter() - started:.1f} s)")
+
+        days, cumulative = _calendar(end, YEARS)
+        order_rows = list(_orders(rng, clients, orders, days, cumulative))
+        _insert(conn, """
+            INSERT INTO orders (order_name, client_id, width, length, price_per_cm, total_price, payment_type, order_type, order_date, order_date_iso, order_day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, order_rows)
+        log(f"orders: {orders} ({time.perf_counter() - started:.1f} s)")
+
+        _insert(conn, """
+            INSERT INTO payments (client_id, payment_date, payment_date_iso, payment_day, amount_paid)
+            VALUES (?, ?, ?, ?, ?)
+        """, _payments(rng, order_rows, payments, days[-1]))
+        del order_rows
+        log(f"payments: {database.fetch_one('SELECT COUNT(*) FROM payments')[0]} "
+            f"({time.perf_counter() - started:.1f} s)")
+
+        for kind, name, sql in saved:
+            if kind == "index":
+                conn.execute(sql)
+        _refresh_derived(conn)
+        for kind, name, sql in saved:
+            if kind == "trigger":
+                conn.execute(sql)
+    log(f"done in {time.perf_counter() - started:.1f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic business database.")
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--profile", choices=PROFILES, default="small")
+    parser.add_argument("--clients", type=int)
+    parser.add_argument("--orders", type=int)
+    parser.add_argument("--payments", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", type=date.fromisoformat, default=END_DATE, help="last day of history (yyyy-mm-dd)")
+    args = parser.parse_args(argv)
+    clients, orders, payments = PROFILES[args.profile]
+    generate(args.path, args.clients or clients, args.orders or orders, args.payments or payments,
+             args.seed, args.end)
+    database.close_all()
+
+
+if __name__ == "__main__":
+    main()
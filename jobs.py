@@ -0,0 +1,67 @@
+import time
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+import database
+import export
+
+
+class ExportJob(QObject):
+    """Runs an export on its own thread and reports back through signals.
+
+    export_function(target, progress) is export.export_workbook or
+    analytics_export.export_tables; it returns the path written (or None for
+    target itself). Signals are delivered to the GUI thread, which only updates
+    widgets; the export itself never touches Qt.
+    """
+    progress = pyqtSignal(int, int)  # clients / partitions done, total
+    finished = pyqtSignal(str)  # path written
+    failed = pyqtSignal(str)  # error message
+    cancelled = pyqtSignal()
+
+    # Minimum seconds between progress signals, so the GUI isn't flooded on big exports
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, target, export_function=export.export_workbook):
+        super().__init__()
+        self.target = target
+        self.export_function = export_function
+        self._cancel_requested = False
+        self._last_report = 0
+
+    def cancel(self):
+        """Ask the export to stop after the current client (callable from any thread)."""
+        self._cancel_requested = True
+
+    def _report(self, done, total):
+        if self._cancel_requested:
+            raise export.ExportCancelled()
+        now = time.monotonic()
+        if done == total or now - self._last_report >= self.PROGRESS_INTERVAL:
+            self._last_report = now
+            self.progress.emit(done, total)
+
+    def run(self):
+        try:
+            path = self.export_function(self.target, self._report)
+        except export.ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(path or self.target)
+        finally:
+            # Worker threads own their pooled connection; release it with the thread
+            database.close_connection()
+
+
+def start(job, parent):
+    """Move job to a new QThread and start it; the thread stops and is deleted when the job ends."""
+    thread = QThread(parent)
+    job.moveToThread(thread)
+    thread.started.connect(job.run)
+    for signal in (job.finished, job.failed, job.cancelled):
+        signal.connect(thread.quit)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
@@ -1,16 +1,47 @@
-import sqlite3
+import time
+
+_START = time.perf_counter()  # Taken before the Qt imports so the profile covers them
+
+import importlib
+import multiprocessing
 import sys
 
-import pandas as pd
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QIcon, QFont, QPalette, QColor, QAction
 from PyQt6.QtWidgets import (
-    QApplication, QMainWindow, QPushButton, QWidget, QVBoxLayout, QMessageBox, QToolBar, QGridLayout
+    QApplication, QMainWindow, QPushButton, QWidget, QVBoxLayout, QMessageBox, QToolBar, QGridLayout,
+    QProgressBar
 )
 from PyQt6.QtWidgets import QFileDialog
 
-import constants, add_order, add_payment, add_client, edit_payment, edit_order,\
-    view_clients, financials, client_records
+import database
+import query_executor
+import query_log
+import service_client
+import stall_watchdog
+
+# Dialog and export modules are imported on first use; after the window is up
+# they are preloaded one per idle tick so the first click doesn't pay for them
+WARMUP_MODULES = ["add_order", "add_payment", "add_client", "edit_order", "edit_payment",
+                  "view_clients", "client_records", "financials", "jobs", "export"]
+
+# Seconds from process start to a painted main window before --profile-startup warns
+STARTUP_BUDGET = 1.5
+
+_phases = []  # (phase, seconds since _START), recorded for --profile-startup
+
+
+def mark_phase(name):
+    _phases.append((name, time.perf_counter() - _START))
+
+
+def print_startup_profile():
+    previous = 0
+    for name, at in _phases:
+        print(f"{name:<24}{(at - previous) * 1000:8.1f} ms{at * 1000:10.1f} ms", file=sys.stderr)
+        previous = at
+    if _phases and _phases[-1][1] > STARTUP_BUDGET:
+        print(f"Startup took {_phases[-1][1]:.2f} s, over the {STARTUP_BUDGET} s budget", file=sys.stderr)
 
 
 # Function to get resource path (for cross-platform compatibility)
@@ -85,7 +116,7 @@ def apply_excel_theme(app_instance):
         QComboBox::down-arrow {
             image: url(:/icons/green_arrow.png);
         }
-        QTableWidget {
+        QTableView {
             font-size: 14px;
             border: 1px solid #ccc;
             background-color: #ffffff;
@@ -93,7 +124,7 @@ def apply_excel_theme(app_instance):
             selection-background-color: #e0ffe0;
             selection-color: #000000;
         }
-        QTableWidget::item:selected {
+        QTableView::item:selected {
             background-color: #e0ffe0;
             color: #000000;
         }
@@ -164,6 +195,22 @@ class MainWindow(QMainWindow):
         export_action.triggered.connect(self.export_to_excel)
         toolbar.addAction(export_action)
 
+        analytics_export_action = QAction("تصدير للتحليل (CSV/Parquet)", self)
+        analytics_export_action.triggered.connect(self.export_for_analysis)
+        toolbar.addAction(analytics_export_action)
+
+        # The exports stream whole tables from the file, which a thin client never opens
+        if service_client.URL:
+            for action in (export_action, analytics_export_action):
+                action.setEnabled(False)
+                action.setToolTip("غير متاح عند العمل عبر الخدمة")
+
+        # Only there when the app was started with BUSINESS_SQL_LOG set
+        if query_log.enabled:
+            query_stats_action = QAction("إحصائيات الاستعلامات", self)
+            query_stats_action.triggered.connect(self.show_query_stats)
+            toolbar.addAction(query_stats_action)
+
         # Create container widget and set layout
         container = QWidget()
         main_layout.setContentsMargins(20, 20, 20, 20)
@@ -172,69 +219,115 @@ class MainWindow(QMainWindow):
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
-        # Status bar
+        # Status bar, with the progress of a running export
         self.statusBar().showMessage("جاهز")
+        self.export_progress = QProgressBar()
+        self.export_progress.setMaximumWidth(200)
+        self.cancel_export_button = QPushButton("إلغاء التصدير")
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        self.statusBar().addPermanentWidget(self.export_progress)
+        self.statusBar().addPermanentWidget(self.cancel_export_button)
+        self.export_progress.hide()
+        self.cancel_export_button.hide()
+        self.export_job = None
+        self.export_thread = None
 
     def export_to_excel(self):
-        """Exports the database to an Excel file where each client has their own sheet."""
+        """Exports the database to an Excel file where each client has their own sheet.
+
+        The export runs on a worker thread; progress is shown in the status bar.
+        """
+        if self.export_job is not None:
+            QMessageBox.information(self, "تصدير", "يوجد تصدير قيد التنفيذ بالفعل.")
+            return
+
         file_path, _ = QFileDialog.getSaveFileName(self, "حفظ ملف Excel", "", "Excel Files (*.xlsx);;All Files (*)")
 
         if not file_path:
             return  # User canceled
+        import export
+        self.start_export(jobs_module().ExportJob(file_path, export.export_workbook))
+
+    def export_for_analysis(self):
+        """Exports clients, orders and payments as monthly CSV/Parquet partitions for analysis."""
+        if self.export_job is not None:
+            QMessageBox.information(self, "تصدير", "يوجد تصدير قيد التنفيذ بالفعل.")
+            return
+
+        out_dir = QFileDialog.getExistingDirectory(self, "اختر مجلد التصدير")
+        if not out_dir:
+            return  # User canceled
 
+        import analytics_export
+        formats = analytics_export.FORMATS
         try:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-
-            # Fetch all clients
-            cursor.execute("SELECT * FROM clients")
-            clients = cursor.fetchall()
-
-            with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
-                if not clients:
-                    # ✅ Ensure at least one sheet exists if no clients found
-                    df_empty = pd.DataFrame({"ملاحظة": ["لا توجد بيانات متاحة"]})
-                    df_empty.to_excel(writer, sheet_name="لا يوجد عملاء", index=False)
-                else:
-                    for client in clients:
-                        client_id, name, paid, owed, total_bill = client
-
-                        # Fetch client's orders
-                        cursor.execute("SELECT * FROM orders WHERE client_id = ?", (client_id,))
-                        orders = cursor.fetchall()
-                        orders_df = pd.DataFrame(orders, columns=[desc[0] for desc in
-                                                                  cursor.description]) if orders else pd.DataFrame()
-
-                        # Fetch client's payments
-                        cursor.execute("SELECT * FROM payments WHERE client_id = ?", (client_id,))
-                        payments = cursor.fetchall()
-                        payments_df = pd.DataFrame(payments, columns=[desc[0] for desc in
-                                                                      cursor.description]) if payments else pd.DataFrame()
-
-                        # Create a sheet for each client
-                        client_sheet_name = f"{name[:25]}"  # Excel sheet names can't exceed 31 characters
-                        client_info_df = pd.DataFrame({
-                            "اسم العميل": [name],
-                            "المبلغ المدفوع": [paid],
-                            "المبلغ المستحق": [owed],
-                            "إجمالي الفاتورة": [total_bill]
-                        })
-                        client_info_df.to_excel(writer, sheet_name=client_sheet_name, index=False, startrow=0)
-
-                        # Write Orders
-                        if not orders_df.empty:
-                            orders_df.to_excel(writer, sheet_name=client_sheet_name, index=False, startrow=3)
-
-                        # Write Payments
-                        if not payments_df.empty:
-                            payments_df.to_excel(writer, sheet_name=client_sheet_name, index=False,
-                                                 startrow=orders_df.shape[0] + 6)
-
-            conn.close()
-            QMessageBox.information(self, "نجاح", f"تم تصدير البيانات إلى {file_path} بنجاح.")
-
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {e}")
+            analytics_export.check_formats(formats)
+        except ImportError:
+            # Parquet needs pyarrow; still export CSV without it
+            formats = ("csv",)
+        self.start_export(jobs_module().ExportJob(
+            out_dir, lambda target, progress: analytics_export.export_tables(target, formats, progress=progress)))
+
+    def start_export(self, job):
+        self.export_job = job
+        self.export_job.progress.connect(self.on_export_progress)
+        self.export_job.finished.connect(self.on_export_finished)
+        self.export_job.failed.connect(self.on_export_failed)
+        self.export_job.cancelled.connect(self.on_export_cancelled)
+        self.export_progress.setRange(0, 0)  # Busy until the first progress report
+        self.export_progress.show()
+        self.cancel_export_button.setEnabled(True)
+        self.cancel_export_button.show()
+        self.statusBar().showMessage("جارٍ التصدير...")
+        self.export_thread = jobs_module().start(self.export_job, self)
+
+    def cancel_export(self):
+        if self.export_job is not None:
+            self.export_job.cancel()
+            self.cancel_export_button.setEnabled(False)
+            self.statusBar().showMessage("جارٍ إلغاء التصدير...")
+
+    def on_export_progress(self, done, total):
+        self.export_progress.setRange(0, max(total, 1))
+        self.export_progress.setValue(min(done, total))
+        if done >= total:
+            self.statusBar().showMessage("جارٍ حفظ الملف...")
+        else:
+            self.statusBar().showMessage(f"جارٍ التصدير: {done} من {total}")
+
+    def on_export_finished(self, file_path):
+        self.end_export("تم التصدير")
+        QMessageBox.information(self, "نجاح", f"تم تصدير البيانات إلى {file_path} بنجاح.")
+
+    def on_export_failed(self, message):
+        self.end_export("فشل التصدير")
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {message}")
+
+    def on_export_cancelled(self):
+        self.end_export("تم إلغاء التصدير")
+
+    def end_export(self, message):
+        self.export_job = None
+        self.export_thread = None
+        self.export_progress.hide()
+        self.cancel_export_button.hide()
+        self.statusBar().showMessage(message)
+
+    def closeEvent(self, event):
+        # Stop a running export and let its thread finish before the window goes away
+        if self.export_job is not None:
+            self.export_job.cancel()
+            self.export_thread.wait()
+        super().closeEvent(event)
+
+    def show_query_stats(self):
+        """Shows the slowest SQL statements so far and appends them to the slow-query log."""
+        query_log.log_stats()
+        message = QMessageBox(self)
+        message.setWindowTitle("إحصائيات الاستعلامات")
+        message.setText(f"عدد الاستعلامات المختلفة: {len(query_log.stats())}")
+        message.setDetailedText(query_log.format_stats())
+        message.exec()
 
     def create_button_layout(self):
         layout = QGridLayout()
@@ -310,15 +403,54 @@ class MainWindow(QMainWindow):
         dialog = FinancialsDialog(self)
         dialog.exec()
 
+def jobs_module():
+    import jobs
+    return jobs
+
+
+def warm_up(modules, started=None):
+    """Import the next module in idle time, then schedule the rest."""
+    started = started or time.perf_counter()
+    if not modules:
+        if "--profile-startup" in sys.argv:
+            print(f"{'warm-up (idle)':<24}{(time.perf_counter() - started) * 1000:8.1f} ms", file=sys.stderr)
+        return
+    importlib.import_module(modules[0])
+    QTimer.singleShot(0, lambda: warm_up(modules[1:], started))
+
+
 def main():
+    # --profile-startup prints the time of each startup phase; --no-warmup skips preloading the dialogs
+    profile = "--profile-startup" in sys.argv
+    # BUSINESS_SQL_LOG=<file> times every statement and logs the slow ones there
+    query_log.enable_from_environment()
+    mark_phase("imports")
     app = QApplication(sys.argv)
+    mark_phase("QApplication")
     #icon_path = str(resource_path('icon.png'))  # Use .png for Windows
     #icon_icns_path = str(resource_path('icon.icns'))  # Use .icns for macOS
     #app.setWindowIcon(QIcon(icon_path))
     apply_excel_theme(app)
+    app.aboutToQuit.connect(query_log.log_stats)
+    # Background queries finish before their connections are closed
+    app.aboutToQuit.connect(query_executor.shutdown)
+    app.aboutToQuit.connect(database.close_all)
     window = MainWindow()
+    mark_phase("main window built")
     window.showMaximized()
+    app.processEvents()
+    mark_phase("main window shown")
+    if profile:
+        print_startup_profile()
+    # Logs where the GUI thread was when it stops responding (BUSINESS_STALL_MS=0 turns it off)
+    watchdog = stall_watchdog.start_from_environment(app)
+    if watchdog is not None:
+        app.aboutToQuit.connect(watchdog.stop)
+    if "--no-warmup" not in sys.argv:
+        QTimer.singleShot(0, lambda: warm_up(WARMUP_MODULES))
     sys.exit(app.exec())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # The analytics export starts worker processes, which must not start the GUI again in a frozen app
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,372 @@
+import sqlite3
+
+import dates
+from arabic_text import normalize_sql
+
+
+def _create_base_tables(conn):
+    # Create clients table
+    conn.execute("""
+            CREATE TABLE IF NOT EXISTS clients (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                paid_amount REAL DEFAULT 0,
+                owed_amount REAL DEFAULT 0,
+                total_bill REAL DEFAULT 0
+            )
+        """)
+
+    # Create orders table with modified date format, Arabic day, and new 'order_type' column
+    conn.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_name TEXT NOT NULL,
+                client_id INTEGER,
+                width REAL,
+                length REAL,
+                price_per_cm REAL,
+                total_price REAL,
+                payment_type TEXT,
+                order_type TEXT,    -- New column for order type
+                order_date TEXT,    -- Format: dd/mm/yyyy
+                order_day TEXT,     -- Arabic day name
+                FOREIGN KEY(client_id) REFERENCES clients(id)
+            )
+        """)
+
+    # Create payments table with modified date format and Arabic day
+    conn.execute("""
+            CREATE TABLE IF NOT EXISTS payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_id INTEGER,
+                payment_date TEXT,    -- Format: dd/mm/yyyy
+                payment_day TEXT,     -- Arabic day name
+                amount_paid REAL,
+                FOREIGN KEY(client_id) REFERENCES clients(id)
+            )
+        """)
+
+
+def _add_client_indexes(conn):
+    # Orders of one client (client records, export, delete check)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_client ON orders(client_id)")
+    # Covers the client records payments table, so it never touches the payments rows
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_client
+        ON payments(client_id, payment_date, payment_day, amount_paid)
+    """)
+
+
+# Rows per UPDATE when filling a new column on an existing table
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _iso_date_sql(column):
+    """SQL expression turning a dd/mm/yyyy column into yyyy-mm-dd (NULL when it doesn't match)."""
+    return (f"CASE WHEN {column} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]' "
+            f"THEN substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) END")
+
+
+def _backfill(conn, table, sql_set):
+    max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+    for start in range(0, max_id + 1, BACKFILL_BATCH_SIZE):
+        conn.execute(f"UPDATE {table} SET {sql_set} WHERE id >= ? AND id < ?",
+                     (start, start + BACKFILL_BATCH_SIZE))
+
+
+def _add_iso_dates(conn, table, date_column):
+    iso_column = f"{date_column}_iso"
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {iso_column} TEXT")
+
+    # The backfill parses with Python so older hand-typed dates (e.g. 5/3/2024) are kept too
+    conn.create_function("iso_date", 1, dates.to_iso)
+    _backfill(conn, table, f"{iso_column} = iso_date({date_column})")
+
+    # Writers that only set the dd/mm/yyyy text (older copies of the app, manual edits) still get an ISO date
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_iso_insert
+        AFTER INSERT ON {table}
+        WHEN NEW.{iso_column} IS NULL AND NEW.{date_column} IS NOT NULL
+        BEGIN
+            UPDATE {table} SET {iso_column} = {_iso_date_sql('NEW.' + date_column)} WHERE id = NEW.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_iso_update
+        AFTER UPDATE OF {date_column} ON {table}
+        WHEN NEW.{iso_column} IS OLD.{iso_column}
+        BEGIN
+            UPDATE {table} SET {iso_column} = {_iso_date_sql('NEW.' + date_column)} WHERE id = NEW.id;
+        END
+    """)
+
+
+def _add_sortable_dates(conn):
+    _add_iso_dates(conn, "orders", "order_date")
+    _add_iso_dates(conn, "payments", "payment_date")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date_iso)")
+    # Covers the financials query (date range -> day name and amount)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_date
+        ON payments(payment_date_iso, payment_day, amount_paid)
+    """)
+
+
+def rebuild_daily_revenue(conn):
+    """Recompute the daily_revenue rollup from payments; returns the number of days."""
+    conn.execute("DELETE FROM daily_revenue")
+    conn.execute("""
+        INSERT INTO daily_revenue (day, total, payment_count)
+        SELECT payment_date_iso, SUM(COALESCE(amount_paid, 0)), COUNT(*)
+        FROM payments
+        WHERE payment_date_iso IS NOT NULL
+        GROUP BY payment_date_iso
+    """)
+    return conn.execute("SELECT COUNT(*) FROM daily_revenue").fetchone()[0]
+
+
+def _add_daily_revenue(conn):
+    # One row per day with payments; the triggers below keep it equal to SUM(amount_paid) per payment_date_iso
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_revenue (
+            day TEXT PRIMARY KEY,    -- Format: yyyy-mm-dd
+            total REAL NOT NULL DEFAULT 0,
+            payment_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_revenue_insert
+        AFTER INSERT ON payments
+        WHEN NEW.payment_date_iso IS NOT NULL
+        BEGIN
+            INSERT INTO daily_revenue (day, total, payment_count)
+            VALUES (NEW.payment_date_iso, COALESCE(NEW.amount_paid, 0), 1)
+            ON CONFLICT(day) DO UPDATE SET total = total + excluded.total, payment_count = payment_count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_revenue_delete
+        AFTER DELETE ON payments
+        WHEN OLD.payment_date_iso IS NOT NULL
+        BEGIN
+            UPDATE daily_revenue
+            SET total = total - COALESCE(OLD.amount_paid, 0), payment_count = payment_count - 1
+            WHERE day = OLD.payment_date_iso;
+            DELETE FROM daily_revenue WHERE day = OLD.payment_date_iso AND payment_count <= 0;
+        END
+    """)
+    # Also fires when the ISO trigger fills in the date of a freshly inserted payment
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_revenue_update
+        AFTER UPDATE OF payment_date_iso, amount_paid ON payments
+        BEGIN
+            UPDATE daily_revenue
+            SET total = total - COALESCE(OLD.amount_paid, 0), payment_count = payment_count - 1
+            WHERE day = OLD.payment_date_iso;
+            DELETE FROM daily_revenue WHERE day = OLD.payment_date_iso AND payment_count <= 0;
+            INSERT INTO daily_revenue (day, total, payment_count)
+            SELECT NEW.payment_date_iso, COALESCE(NEW.amount_paid, 0), 1
+            WHERE NEW.payment_date_iso IS NOT NULL
+            ON CONFLICT(day) DO UPDATE SET total = total + excluded.total, payment_count = payment_count + 1;
+        END
+    """)
+    rebuild_daily_revenue(conn)
+
+
+def _add_balance_triggers(conn):
+    # An order adds to the bill and to what is owed; a payment moves money from owed to paid.
+    # A cash order inserts its payment in the same transaction, so it nets out as paid.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_balance_insert
+        AFTER INSERT ON orders
+        BEGIN
+            UPDATE clients
+            SET total_bill = total_bill + COALESCE(NEW.total_price, 0),
+                owed_amount = owed_amount + COALESCE(NEW.total_price, 0)
+            WHERE id = NEW.client_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_balance_delete
+        AFTER DELETE ON orders
+        BEGIN
+            UPDATE clients
+            SET total_bill = total_bill - COALESCE(OLD.total_price, 0),
+                owed_amount = owed_amount - COALESCE(OLD.total_price, 0)
+            WHERE id = OLD.client_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_orders_balance_update
+        AFTER UPDATE OF total_price, client_id ON orders
+        BEGIN
+            UPDATE clients
+            SET total_bill = total_bill - COALESCE(OLD.total_price, 0),
+                owed_amount = owed_amount - COALESCE(OLD.total_price, 0)
+            WHERE id = OLD.client_id;
+            UPDATE clients
+            SET total_bill = total_bill + COALESCE(NEW.total_price, 0),
+                owed_amount = owed_amount + COALESCE(NEW.total_price, 0)
+            WHERE id = NEW.client_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_balance_insert
+        AFTER INSERT ON payments
+        BEGIN
+            UPDATE clients
+            SET paid_amount = paid_amount + COALESCE(NEW.amount_paid, 0),
+                owed_amount = owed_amount - COALESCE(NEW.amount_paid, 0)
+            WHERE id = NEW.client_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_balance_delete
+        AFTER DELETE ON payments
+        BEGIN
+            UPDATE clients
+            SET paid_amount = paid_amount - COALESCE(OLD.amount_paid, 0),
+                owed_amount = owed_amount + COALESCE(OLD.amount_paid, 0)
+            WHERE id = OLD.client_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_payments_balance_update
+        AFTER UPDATE OF amount_paid, client_id ON payments
+        BEGIN
+            UPDATE clients
+            SET paid_amount = paid_amount - COALESCE(OLD.amount_paid, 0),
+                owed_amount = owed_amount + COALESCE(OLD.amount_paid, 0)
+            WHERE id = OLD.client_id;
+            UPDATE clients
+            SET paid_amount = paid_amount + COALESCE(NEW.amount_paid, 0),
+                owed_amount = owed_amount - COALESCE(NEW.amount_paid, 0)
+            WHERE id = NEW.client_id;
+        END
+    """)
+
+
+def _add_payment_sort_indexes(conn):
+    # Sort keys and filters of the payments editor
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_date_sort ON payments(payment_date_iso)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_amount ON payments(amount_paid)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_client_date ON payments(client_id, payment_date_iso)")
+
+
+def _add_change_counters(conn):
+    # One row per watched table, bumped by triggers; caches compare it with the version they loaded
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('clients', 0)")
+    # Balance updates don't touch the name, so they leave the client list cache alone
+    for trigger, event, condition in (("insert", "INSERT", ""), ("delete", "DELETE", ""),
+                                      ("update", "UPDATE OF name", "WHEN NEW.name IS NOT OLD.name")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_clients_version_{trigger}
+            AFTER {event} ON clients {condition}
+            BEGIN
+                UPDATE change_counters SET version = version + 1 WHERE name = 'clients';
+            END
+        """)
+
+
+def _add_client_search(conn):
+    # Trigram FTS5 needs SQLite 3.34+; without it client_directory.search() scans the names in memory
+    try:
+        conn.execute("CREATE VIRTUAL TABLE client_search USING fts5(name, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return
+    # rowid is the client id; name holds the normalized spelling
+    conn.execute(f"INSERT INTO client_search (rowid, name) SELECT id, {normalize_sql('name')} FROM clients")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clients_search_insert
+        AFTER INSERT ON clients
+        BEGIN
+            INSERT INTO client_search (rowid, name) VALUES (NEW.id, {normalize_sql('NEW.name')});
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_clients_search_delete
+        AFTER DELETE ON clients
+        BEGIN
+            DELETE FROM client_search WHERE rowid = OLD.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clients_search_update
+        AFTER UPDATE OF name ON clients WHEN NEW.name IS NOT OLD.name
+        BEGIN
+            UPDATE client_search SET name = {normalize_sql('NEW.name')} WHERE rowid = NEW.id;
+        END
+    """)
+
+
+def _add_client_page_index(conn):
+    # The client records payments table pages on (client_id, id); covering, so a page never touches
+    # the payments rows. It replaces idx_payments_client, which covered the old read-everything query.
+    conn.execute("DROP INDEX IF EXISTS idx_payments_client")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_client_page
+        ON payments(client_id, id, payment_date, payment_day, amount_paid)
+    """)
+
+
+# (version, upgrade) pairs; PRAGMA user_version holds the last version applied.
+# Append new migrations at the end and never edit one that has shipped.
+MIGRATIONS = [
+    (1, _create_base_tables),
+    (2, _add_client_indexes),
+    (3, _add_sortable_dates),
+    (4, _add_daily_revenue),
+    (5, _add_balance_triggers),
+    (6, _add_payment_sort_indexes),
+    (7, _add_change_counters),
+    (8, _add_client_search),
+    (9, _add_client_page_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION in place; returns the version it started from."""
+    start_version = get_version(conn)
+    for version, upgrade in MIGRATIONS:
+        if version <= start_version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have upgraded while we waited for the lock
+            if get_version(conn) < version:
+                upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return start_version
+
+
+def check_query_plans(conn, statements):
+    """Return (statement, plan detail) for every statement that falls back to a full table scan.
+
+    statements are complete SQL (e.g. recorded with conn.set_trace_callback, which
+    expands the parameters); tests/test_query_plans.py checks the app's hot paths.
+    """
+    failures = []
+    for sql in statements:
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+            detail = row[-1]
+            # A SELECT without FROM "scans" its one constant row, and a FROM (subquery) the rows it produced
+            if (detail.startswith("SCAN") and "INDEX" not in detail and detail != "SCAN CONSTANT ROW"
+                    and not detail.startswith(("SCAN (subquery", "SCAN SUBQUERY"))):
+                failures.append((sql, detail))
+    return failures
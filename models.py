@@ -0,0 +1,411 @@
+from PyQt6.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QModelIndex, QObject, QTimer, pyqtSignal
+
+import change_bus
+import client_directory
+import database
+import editor_pages
+import records_cache
+import service_client
+
+
+class ChangeNotifier(QObject):
+    """change_bus events delivered on the GUI thread, plus change_bus.RELOAD when
+    PRAGMA data_version shows that another process committed to the database.
+
+    Thin clients have no connection to watch; they poll the service's
+    /changes version instead, so every change arrives as RELOAD."""
+    changed = pyqtSignal(object)
+
+    POLL_INTERVAL = 1000  # ms
+    SERVICE_TIMEOUT = 0.5  # Seconds a poll may hold the GUI thread when the service is slow
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        if not service_client.URL:
+            change_bus.enable()
+            change_bus.install(database.get_connection())
+        change_bus.subscribe(self.changed.emit)
+        self._data_version = None
+        self._data_version = self._read_data_version()
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_INTERVAL)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start()
+
+    def _read_data_version(self):
+        if service_client.URL:
+            try:
+                return service_client.URL, service_client.get("/changes", self.SERVICE_TIMEOUT)["version"]
+            except (service_client.ServiceError, OSError):
+                return self._data_version  # Unreachable for now; the next poll tries again
+        # Only commits from other connections move it, never the GUI thread's own
+        return database.DB_PATH, database.fetch_one("PRAGMA data_version")[0]
+
+    def poll(self):
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            # Through the bus, so caches outside the GUI (records_cache) drop what they hold too
+            change_bus.publish(change_bus.RELOAD)
+
+
+_change_notifier = None
+
+
+def change_notifier():
+    global _change_notifier
+    if _change_notifier is None:
+        _change_notifier = ChangeNotifier()
+    return _change_notifier
+
+
+def follow_changes(dialog, slot):
+    """Call slot(event) for every committed change until dialog is closed."""
+    notifier = change_notifier()
+    # Queued, so slots run after the write path that committed has returned
+    notifier.changed.connect(slot, Qt.ConnectionType.QueuedConnection)
+    dialog.finished.connect(lambda: notifier.changed.disconnect(slot))
+
+
+class LazyTableModel(QAbstractTableModel):
+    """Read-only table filled one batch at a time as the view scrolls.
+
+    Subclasses implement fetch_after(last_row, limit), which returns the rows
+    that follow last_row (None for the first batch) in the model's order, and
+    fetch_row(row_id), which returns one row or None if it doesn't pass the
+    filters. Rows are plain tuples whose first value is the row id; cells are
+    formatted only when the view paints them. TABLE, NAME_COLUMN and
+    CLIENT_COLUMN tell apply_change() which events concern the model and where
+    the client name and id are in a row.
+    """
+    HEADERS = []
+    BATCH_SIZE = 200
+    TABLE = None
+    NAME_COLUMN = None
+    CLIENT_COLUMN = None
+    descending = False
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._exhausted = False
+
+    def reload(self):
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self.cell(self._rows[index.row()], index.column())
+
+    def cell(self, row, column):
+        """Text shown in one column of a row."""
+        return str(row[column])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        rows = self.fetch_after(self._rows[-1] if self._rows else None, self.BATCH_SIZE)
+        if len(rows) < self.BATCH_SIZE:
+            self._exhausted = True
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def fetch_after(self, last_row, limit):
+        raise NotImplementedError
+
+    def fetch_row(self, row_id):
+        raise NotImplementedError
+
+    def sort_key(self, row):
+        return row[0]
+
+    def row_id(self, row):
+        return self._rows[row][0]
+
+    def apply_change(self, event):
+        """Bring the loaded rows up to date with one change_bus event, without reloading the rest."""
+        if event.action == "reload":
+            self.reload()
+        elif event.table == "clients" and event.action == "update":
+            self._rename_client(event.row_id)
+        elif event.table == self.TABLE:
+            position = self._position(event.row_id)
+            row = None if event.action == "delete" else self.fetch_row(event.row_id)
+            if position is not None:
+                if row is not None and self.sort_key(row) == self.sort_key(self._rows[position]):
+                    self._rows[position] = row
+                    self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.HEADERS) - 1))
+                    return
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self._rows[position]
+                self.endRemoveRows()
+            if row is not None:
+                self._insert_sorted(row)
+
+    def _position(self, row_id):
+        for position, row in enumerate(self._rows):
+            if row[0] == row_id:
+                return position
+        return None
+
+    def _insert_sorted(self, row):
+        key = self.sort_key(row)
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = self.sort_key(self._rows[middle])
+            if (other > key) if self.descending else (other < key):
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self._rows) and not self._exhausted:
+            return  # Past the rows loaded so far; fetchMore() will bring it in order
+        self.beginInsertRows(QModelIndex(), low, low)
+        self._rows.insert(low, row)
+        self.endInsertRows()
+
+    def _rename_client(self, client_id):
+        if self.NAME_COLUMN is None:
+            return
+        positions = [i for i, row in enumerate(self._rows) if row[self.CLIENT_COLUMN] == client_id]
+        if not positions:
+            return
+        name = database.fetch_one("SELECT name FROM clients WHERE id = ?", (client_id,))[0]
+        if name == self._rows[positions[0]][self.NAME_COLUMN]:
+            return  # A balance update
+        for position in positions:
+            row = list(self._rows[position])
+            row[self.NAME_COLUMN] = name
+            self._rows[position] = tuple(row)
+            index = self.index(position, self.NAME_COLUMN)
+            self.dataChanged.emit(index, index)
+
+
+class OrdersTableModel(LazyTableModel):
+    """All orders joined to their client, paged on orders.id (keyset pagination),
+    so opening the dialog costs the same however many orders exist."""
+    HEADERS = ["ID", "اسم الطلب", "العرض (سم)", "الطول (سم)", " نوع الطلب", "العميل", "السعر لكل سم",
+               "السعر الإجمالي", "نوع الدفع", "تاريخ الطلب", "اليوم"]
+    TABLE = "orders"
+    NAME_COLUMN = 5
+    CLIENT_COLUMN = 11
+
+    def __init__(self, order_id=None, parent=None):
+        super().__init__(parent)
+        self.order_id = order_id
+
+    def fetch_after(self, last_row, limit):
+        return editor_pages.orders_after(last_row[0] if last_row else 0, limit, self.order_id)
+
+    def fetch_row(self, row_id):
+        return editor_pages.order_row(row_id, self.order_id)
+
+
+class PaymentsTableModel(LazyTableModel):
+    """Payments with filters and header sorting done by SQLite.
+
+    Filters and sort keys are indexed columns, and batches continue from the
+    (sort key, id) of the last row loaded, so finding one payment among
+    millions never reads the whole ledger into memory.
+    """
+    HEADERS = ["ID", "العميل", "تاريخ الدفع", "يوم الدفع", "المبلغ المدفوع"]
+    TABLE = "payments"
+    NAME_COLUMN = 1
+    CLIENT_COLUMN = 6
+    SORT_COLUMNS = editor_pages.PAYMENT_SORT_KEYS
+
+    def __init__(self, payment_id=None, parent=None):
+        super().__init__(parent)
+        self.payment_id = payment_id
+        self.sort_column = 0
+        self.descending = False
+        self.filters = {}
+
+    def set_filters(self, client_id=None, date_from=None, date_to=None, amount_min=None, amount_max=None):
+        """Dates are ISO strings (both ends inclusive); None leaves that bound open."""
+        self.filters = {"client_id": client_id, "date_from": date_from, "date_to": date_to,
+                        "amount_min": amount_min, "amount_max": amount_max}
+        self.reload()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if column not in self.SORT_COLUMNS:
+            return
+        self.sort_column = column
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    def fetch_after(self, last_row, limit):
+        after = (last_row[0], self._sort_value(last_row)) if last_row else None
+        return editor_pages.payments_after(self.filters, self.sort_column, self.descending, after, limit,
+                                           self.payment_id)
+
+    def _sort_value(self, row):
+        return {0: row[0], 2: row[5], 4: row[4]}[self.sort_column]
+
+    def fetch_row(self, row_id):
+        return editor_pages.payment_row(row_id, self.filters, self.payment_id)
+
+    def sort_key(self, row):
+        """Ascending model order as a tuple: NULL keys first by id, then (key, id)."""
+        if self.sort_column == 0:
+            return (1, 0, row[0])
+        value = self._sort_value(row)
+        return (0, 0, row[0]) if value is None else (1, value, row[0])
+
+
+class ClientOrdersModel(LazyTableModel):
+    """One client's orders for the client records screen, paged on orders.id.
+
+    rows is the first page when the caller already has it (records_cache).
+    """
+    HEADERS = ["اسم الطلب", "نوع الطلب", "العرض (سم)", "الطول (سم)", "السعر لكل سم", "إجمالي السعر", "نوع الدفع", "تاريخ الطلب", "اليوم"]
+    BATCH_SIZE = records_cache.PAGE_SIZE
+    TABLE = "orders"
+
+    def __init__(self, client_id, rows=None, parent=None):
+        super().__init__(parent)
+        self.client_id = client_id
+        if rows is not None:
+            self._rows = list(rows)
+            self._exhausted = len(rows) < self.BATCH_SIZE
+
+    def cell(self, row, column):
+        # Rows are records_cache.ORDER_COLUMNS; the id isn't shown
+        return str(row[column + 1])
+
+    def fetch_after(self, last_row, limit):
+        return records_cache.read_orders(self.client_id, last_row[0] if last_row else 0, limit)
+
+    def fetch_row(self, row_id):
+        rows = records_cache.read_orders(self.client_id, row_id - 1, 1)
+        return rows[0] if rows and rows[0][0] == row_id else None
+
+
+class ClientPaymentsModel(ClientOrdersModel):
+    """One client's payments for the client records screen, paged on payments.id."""
+    HEADERS = ["تاريخ الدفع", "يوم الدفع", "المبلغ المدفوع"]
+    TABLE = "payments"
+
+    def cell(self, row, column):
+        # Rows are records_cache.PAYMENT_COLUMNS
+        if column == 2:
+            return f"{row[3]:.2f}"
+        return str(row[column + 1])
+
+    def fetch_after(self, last_row, limit):
+        return records_cache.read_payments(self.client_id, last_row[0] if last_row else 0, limit)
+
+    def fetch_row(self, row_id):
+        rows = records_cache.read_payments(self.client_id, row_id - 1, 1)
+        return rows[0] if rows and rows[0][0] == row_id else None
+
+
+class ClientListModel(QAbstractListModel):
+    """Client names for combo boxes, with the client id under Qt.UserRole.
+
+    One instance is shared by every picker (see client_list_model()), so
+    opening a dialog reuses the names already in memory.
+    """
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else client_directory.count()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return client_directory.name(index.row())
+        if role == Qt.ItemDataRole.UserRole:
+            return client_directory.client_id(index.row())
+        return None
+
+    def refresh(self):
+        """Pick up added, renamed or deleted clients; a no-op when nothing changed."""
+        if client_directory.changed():
+            self.beginResetModel()
+            client_directory.load()
+            self.endResetModel()
+
+    def apply_change(self, event):
+        """Insert, remove or rename the one client an event is about."""
+        if event.action == "reload":
+            self.refresh()
+            return
+        if event.table != "clients":
+            return
+        index = client_directory.index_of(event.row_id)
+        row = database.fetch_one("SELECT name FROM clients WHERE id = ?", (event.row_id,))
+        if row is None:
+            if index >= 0:
+                self.beginRemoveRows(QModelIndex(), index, index)
+                client_directory.remove(index)
+                self.endRemoveRows()
+            elif event.action in ("insert", "delete"):
+                client_directory.note_change()
+        elif index < 0:
+            index = client_directory.insertion_index(event.row_id)
+            self.beginInsertRows(QModelIndex(), index, index)
+            client_directory.insert(index, event.row_id, row[0])
+            self.endInsertRows()
+        elif row[0] != client_directory.name(index):
+            client_directory.rename(index, row[0])
+            self.dataChanged.emit(self.index(index, 0), self.index(index, 0))
+
+
+class ClientSearchModel(QAbstractListModel):
+    """The current matches of a client search box, with the client id under Qt.UserRole."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def search(self, text):
+        self.beginResetModel()
+        self._rows = client_directory.search(text)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._rows[index.row()][1]
+        if role == Qt.ItemDataRole.UserRole:
+            return self._rows[index.row()][0]
+        return None
+
+
+_client_list_model = None
+
+
+def client_list_model():
+    """The process-wide ClientListModel, refreshed if clients changed."""
+    global _client_list_model
+    if _client_list_model is None:
+        _client_list_model = ClientListModel()
+        change_notifier().changed.connect(_client_list_model.apply_change, Qt.ConnectionType.QueuedConnection)
+    _client_list_model.refresh()
+    return _client_list_model
@@ -0,0 +1,142 @@
+"""Write paths shared by the dialogs.
+
+Client balances (paid_amount, owed_amount, total_bill) are maintained by the
+triggers from migration 5, so each function here is one short transaction and
+never reads a balance back into Python to adjust it. @_write_path runs each
+one in BEGIN IMMEDIATE and retries it while another desk holds the lock, or
+sends it to the local service when this process is its thin client.
+"""
+import functools
+import inspect
+import sqlite3
+from datetime import datetime
+
+import database
+import dates
+import service_client
+from constants import arabic_days
+
+CASH = "نقدًا"
+INSTALLMENT = "تقسيطًا"
+
+
+class BalanceError(Exception):
+    """A payment larger than what the client still owes."""
+
+
+# What a write path can raise besides BalanceError: SQLite's errors (a lock held past the retries), or,
+# for a thin client, the service's error responses and OSError when it can't be reached
+ERRORS = (sqlite3.Error, service_client.ServiceError, OSError)
+
+
+def _write_path(function):
+    local = database.write(function)
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if service_client.URL is None:
+            return local(*args, **kwargs)
+        arguments = signature.bind(*args, **kwargs).arguments
+        try:
+            return service_client.run_operation(function.__name__, arguments)
+        except service_client.ServiceError as e:
+            if e.kind == "balance":
+                raise BalanceError(arguments.get("amount_paid")) from None
+            raise
+    return wrapper
+
+
+def _today():
+    """Today's date as (dd/mm/yyyy, yyyy-mm-dd, Arabic day name)."""
+    now = datetime.now()
+    return now.strftime("%d/%m/%Y"), now.strftime("%Y-%m-%d"), arabic_days.get(now.strftime("%A"), "")
+
+
+@_write_path
+def add_client(name, paid_amount=0, owed_amount=0, total_bill=0):
+    # The amounts entered here are the client's opening balance
+    return database.execute("""
+        INSERT INTO clients (name, paid_amount, owed_amount, total_bill)
+        VALUES (?, ?, ?, ?)
+    """, (name, paid_amount, owed_amount, total_bill)).lastrowid
+
+
+@_write_path
+def update_client(client_id, name, paid_amount, owed_amount, total_bill):
+    database.execute("""
+        UPDATE clients
+        SET name = ?, paid_amount = ?, owed_amount = ?, total_bill = ?
+        WHERE id = ?
+    """, (name, paid_amount, owed_amount, total_bill, client_id))
+
+
+@_write_path
+def delete_client(client_id):
+    """Delete a client that has no orders or payments; returns False if it still has some."""
+    cursor = database.execute("""
+        DELETE FROM clients
+        WHERE id = ?
+          AND NOT EXISTS (SELECT 1 FROM orders WHERE client_id = ?)
+          AND NOT EXISTS (SELECT 1 FROM payments WHERE client_id = ?)
+    """, (client_id, client_id, client_id))
+    return cursor.rowcount > 0
+
+
+@_write_path
+def add_order(client_id, order_name, order_type, width, length, price_per_cm, total_price, payment_type):
+    order_date, order_date_iso, order_day = _today()
+    order_id = database.execute("""
+        INSERT INTO orders (order_name, client_id, width, length, price_per_cm, total_price, payment_type, order_type, order_date, order_date_iso, order_day)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (order_name, client_id, width, length, price_per_cm, total_price, payment_type, order_type, order_date, order_date_iso, order_day)).lastrowid
+    # Cash orders are paid on the spot, in the same transaction
+    if payment_type == CASH:
+        database.execute("""
+            INSERT INTO payments (client_id, payment_date, payment_date_iso, payment_day, amount_paid)
+            VALUES (?, ?, ?, ?, ?)
+        """, (client_id, order_date, order_date_iso, order_day, total_price))
+    return order_id
+
+
+@_write_path
+def update_order(order_id, order_name, order_type, width, length, price_per_cm, total_price, payment_type):
+    database.execute("""
+        UPDATE orders
+        SET order_name = ?, order_type = ?, width = ?, length = ?, price_per_cm = ?, total_price = ?, payment_type = ?
+        WHERE id = ?
+    """, (order_name, order_type, width, length, price_per_cm, total_price, payment_type, order_id))
+
+
+@_write_path
+def delete_order(order_id):
+    database.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+
+
+@_write_path
+def add_payment(client_id, amount_paid):
+    """Record a payment made today; raises BalanceError if it exceeds what the client owes."""
+    payment_date, payment_date_iso, payment_day = _today()
+    # The owed check and the insert are one statement, so two desks can't both pay off the same debt
+    cursor = database.execute("""
+        INSERT INTO payments (client_id, payment_date, payment_date_iso, payment_day, amount_paid)
+        SELECT ?, ?, ?, ?, ?
+        WHERE ? <= (SELECT owed_amount FROM clients WHERE id = ?)
+    """, (client_id, payment_date, payment_date_iso, payment_day, amount_paid, amount_paid, client_id))
+    if cursor.rowcount == 0:
+        raise BalanceError(amount_paid)
+    return cursor.lastrowid
+
+
+@_write_path
+def update_payment(payment_id, client_id, payment_date, payment_day, amount_paid):
+    database.execute("""
+        UPDATE payments
+        SET client_id = ?, payment_date = ?, payment_date_iso = ?, payment_day = ?, amount_paid = ?
+        WHERE id = ?
+    """, (client_id, payment_date, dates.to_iso(payment_date), payment_day, amount_paid, payment_id))
+
+
+@_write_path
+def delete_payment(payment_id):
+    database.execute("DELETE FROM payments WHERE id = ?", (payment_id,))
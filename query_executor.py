@@ -0,0 +1,133 @@
+"""Runs the dialogs' read queries off the GUI thread.
+
+    request = query_executor.submit(records_cache.load, client_id)
+    request.finished.connect(self.show_client_records)
+    request.failed.connect(self.show_load_error)
+
+The function runs on one of MAX_THREADS long-lived pool threads, each with its
+own pooled connection (database.get_connection() is per thread). finished and
+failed are delivered on the GUI thread, and never after cancel(). Cancelling
+a query that is already running interrupts its SQLite statement.
+
+LatestQuery keeps only the newest of a series of requests, for inputs like a
+client combobox that can change again before the last query came back.
+"""
+import threading
+
+from PyQt6.QtCore import QObject, QThreadPool, pyqtSignal
+
+import database
+import service_client
+
+MAX_THREADS = 2
+PREFETCH_PRIORITY = -1  # Behind anything the user is waiting for
+
+_pool = None
+_pending = set()  # Requests not yet delivered; also keeps them alive until then
+
+
+class QueryRequest(QObject):
+    finished = pyqtSignal(object)  # the function's return value
+    failed = pyqtSignal(str)  # error message
+    _completed = pyqtSignal(object, object)  # result, exception; emitted on the worker thread
+
+    def __init__(self, function, args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.cancelled = False
+        self.done = False
+        self._lock = threading.Lock()
+        self._connection = None  # Set while the function runs, so cancel() can interrupt it
+        self._completed.connect(self._deliver)
+
+    def cancel(self):
+        """Drop the result; callable from the GUI thread at any time."""
+        with self._lock:
+            self.cancelled = True
+            if self._connection is not None:
+                self._connection.interrupt()
+
+    def _run(self):
+        result = error = None
+        try:
+            with self._lock:
+                if self.cancelled:
+                    self._completed.emit(None, None)
+                    return
+                if not service_client.URL:
+                    # Thin clients read through the service; there is no connection to interrupt
+                    self._connection = database.get_connection()
+            result = self.function(*self.args)
+        except Exception as e:
+            error = e
+        finally:
+            with self._lock:
+                self._connection = None
+        self._completed.emit(result, error)
+
+    def _deliver(self, result, error):
+        self.done = True
+        _pending.discard(self)
+        if self.cancelled:
+            return
+        if error is not None:
+            self.failed.emit(str(error))
+        else:
+            self.finished.emit(result)
+
+
+class LatestQuery:
+    """Latest request wins: submitting cancels the previous request if it hasn't been delivered."""
+
+    def __init__(self):
+        self.request = None
+
+    def submit(self, function, *args):
+        self.cancel()
+        self.request = submit(function, *args)
+        return self.request
+
+    def cancel(self):
+        if self.request is not None:
+            self.request.cancel()
+            self.request = None
+
+    @property
+    def pending(self):
+        return self.request is not None and not self.request.done
+
+
+def _thread_pool():
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(MAX_THREADS)
+        # Threads (and their connections) live as long as the application instead of expiring when idle
+        _pool.setExpiryTimeout(-1)
+    return _pool
+
+
+def submit(function, *args, priority=0):
+    """Run function(*args) on a pool thread and return its QueryRequest (call from the GUI thread).
+
+    Queued requests with a higher priority start first; prefetches use PREFETCH_PRIORITY.
+    """
+    request = QueryRequest(function, args)
+    _pending.add(request)
+    _thread_pool().start(request._run, priority)
+    return request
+
+
+def pending():
+    """Number of requests whose results haven't been delivered yet."""
+    return len(_pending)
+
+
+def shutdown():
+    """Cancel what is queued and wait for running queries, before the connections are closed."""
+    for request in list(_pending):
+        request.cancel()
+    if _pool is not None:
+        _pool.clear()
+        _pool.waitForDone()
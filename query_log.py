@@ -0,0 +1,223 @@
+"""Opt-in timing of the statements run through database.py.
+
+When enabled, every execute / executemany / fetch_all / fetch_one records the
+module and function that issued it, how long it took and how many rows it
+returned or changed. Statements slower than the threshold are written with
+their EXPLAIN QUERY PLAN to a rotating log file, and stats() aggregates the
+timings per statement text.
+
+Enable it with BUSINESS_SQL_LOG=<log file> (and optionally BUSINESS_SQL_SLOW_MS)
+for the GUI, or --sql-log on the command line. When it is off, database.py pays one boolean check per call.
+
+fetch_all and fetch_one are timed until their rows are in Python. A SELECT run
+through execute() returns a cursor the caller iterates afterwards (the export's
+streaming scans); it is wrapped so that the time spent fetching is added in,
+and the statement is recorded once its rows run out or the cursor is closed.
+"""
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+
+enabled = False
+SLOW_QUERY_MS = 50.0
+
+_threshold_ms = SLOW_QUERY_MS
+_lock = threading.Lock()
+_stats = {}  # statement text -> [calls, total ms, max ms, rows, {callers}]
+_logger = logging.getLogger("business.slow_queries")
+_handler = None
+
+# Frames from these files are skipped when looking for the caller of a statement
+_INTERNAL_FILES = {os.path.abspath(__file__),
+                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.py")}
+_PLANNED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def enable(log_path="slow_queries.log", threshold_ms=SLOW_QUERY_MS, max_bytes=1_000_000, backups=3):
+    global enabled, _threshold_ms, _handler
+    disable()
+    _threshold_ms = threshold_ms
+    _handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups,
+                                                    encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _logger.addHandler(_handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+    enabled = True
+
+
+def disable():
+    global enabled, _handler
+    enabled = False
+    if _handler is not None:
+        _logger.removeHandler(_handler)
+        _handler.close()
+        _handler = None
+
+
+def enable_from_environment():
+    """Turn logging on if BUSINESS_SQL_LOG names a log file; returns whether it is on."""
+    log_path = os.environ.get("BUSINESS_SQL_LOG")
+    if log_path:
+        enable(log_path, float(os.environ.get("BUSINESS_SQL_SLOW_MS", SLOW_QUERY_MS)))
+    return enabled
+
+
+def _caller():
+    frame = sys._getframe(2)
+    while frame is not None and os.path.abspath(frame.f_code.co_filename) in _INTERNAL_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+def _normalize(sql):
+    return " ".join(sql.split())
+
+
+def run(conn, kind, sql, params):
+    """Run one database.py helper call (kind is its name) on conn and record it."""
+    caller = _caller()
+    started = time.perf_counter()
+    if kind == "fetch_all":
+        result = conn.execute(sql, params).fetchall()
+        rows = len(result)
+    elif kind == "fetch_one":
+        result = conn.execute(sql, params).fetchone()
+        rows = 0 if result is None else 1
+    elif kind == "executemany":
+        result = conn.executemany(sql, params)
+        rows = result.rowcount
+    else:
+        result = conn.execute(sql, params)
+        rows = result.rowcount
+        if result.description is not None:
+            # Rows still to come: keep timing while the caller fetches them
+            return _TimedCursor(result, conn, sql, params, caller, time.perf_counter() - started)
+    _record(conn, kind, sql, params, (time.perf_counter() - started) * 1000, rows, caller)
+    return result
+
+
+def _record(conn, kind, sql, params, elapsed_ms, rows, caller):
+    statement = _normalize(sql)
+    with _lock:
+        entry = _stats.get(statement)
+        if entry is None:
+            entry = _stats[statement] = [0, 0.0, 0.0, 0, set()]
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2] = max(entry[2], elapsed_ms)
+        entry[3] += max(rows, 0)
+        entry[4].add(caller)
+
+    if elapsed_ms >= _threshold_ms:
+        _log_slow(conn, kind, statement, sql, params, elapsed_ms, rows, caller)
+
+
+class _TimedCursor:
+    """A SELECT cursor from execute() that counts fetching in its statement's time and rows."""
+
+    def __init__(self, cursor, conn, sql, params, caller, elapsed):
+        self._cursor = cursor
+        self._call = conn, sql, params, caller
+        self._elapsed = elapsed  # Seconds
+        self._rows = 0
+        self._recorded = False
+
+    def _fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def _finish(self):
+        if not self._recorded:
+            self._recorded = True
+            conn, sql, params, caller = self._call
+            _record(conn, "execute", sql, params, self._elapsed * 1000, self._rows, caller)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+            raise StopIteration
+        self._rows += 1
+        return row
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self._cursor.arraysize if size is None else size
+        rows = self._fetch(self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        # description, rowcount, lastrowid, ...
+        return getattr(self._cursor, name)
+
+
+def _log_slow(conn, kind, statement, sql, params, elapsed_ms, rows, caller):
+    plan = ""
+    if kind != "executemany" and statement.upper().startswith(_PLANNED):
+        try:
+            plan = "\n".join("    " + row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        except Exception as e:
+            plan = f"    (no plan: {e})"
+    _logger.info(f"{elapsed_ms:.1f} ms, {rows} rows, {caller}: {statement}" + (f"\n{plan}" if plan else ""))
+
+
+def stats():
+    """Per-statement totals, slowest overall first."""
+    with _lock:
+        items = [(statement, list(entry)) for statement, entry in _stats.items()]
+    return sorted(({"sql": statement, "calls": calls, "total_ms": total, "max_ms": longest,
+                    "mean_ms": total / calls, "rows": rows, "callers": sorted(callers)}
+                   for statement, (calls, total, longest, rows, callers) in items),
+                  key=lambda item: item["total_ms"], reverse=True)
+
+
+def format_stats(limit=20):
+    lines = [f"{'total ms':>10} {'calls':>7} {'mean ms':>9} {'max ms':>9} {'rows':>9}  statement / callers"]
+    for item in stats()[:limit]:
+        lines.append(f"{item['total_ms']:10.1f} {item['calls']:7d} {item['mean_ms']:9.2f} {item['max_ms']:9.1f}"
+                     f" {item['rows']:9d}  {item['sql'][:120]}")
+        lines.append(f"{'':49}{', '.join(item['callers'])}")
+    return "\n".join(lines)
+
+
+def log_stats(limit=50):
+    """Append the aggregated table to the log file, e.g. when the application quits."""
+    if _handler is not None and _stats:
+        _logger.info("per-statement totals:\n" + format_stats(limit))
+
+
+def reset():
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,167 @@
+"""Per-client records (summary, orders, payments) for the client records screen.
+
+load(client_id) returns (summary, first page of orders, first page of
+payments), reading them in one query (one request in thin-client mode) on a
+cache miss. The summary is the client's balances and how many orders and
+payments they have; the rest of both tables is paged in by read_orders() and
+read_payments() as the user scrolls, so the screen costs the same for a
+client with ten orders and one with ten thousand.
+
+The last MAX_CLIENTS clients are kept. Writes committed in this process drop
+the entries of the clients they touch as they commit (change_bus);
+change_bus.RELOAD, published when another process wrote, drops everything. A
+load that was already reading when its client changed doesn't store its now
+stale result. Thin clients (service_client.URL) can't see the service's
+commits, so they don't cache.
+
+Safe to call from any thread: the client records dialog reads through it on
+query_executor threads, and prefetches the neighbours of the selected client.
+"""
+import threading
+from collections import OrderedDict
+
+import change_bus
+import database
+import service_client
+
+MAX_CLIENTS = 64
+PAGE_SIZE = 200  # Orders or payments per page, by id
+
+SUMMARY_COLUMNS = ("name", "paid_amount", "owed_amount", "total_bill", "order_count", "payment_count")
+ORDER_COLUMNS = ("id", "order_name", "order_type", "width", "length", "price_per_cm", "total_price", "payment_type", "order_date", "order_day")
+PAYMENT_COLUMNS = ("id", "payment_date", "payment_day", "amount_paid")
+
+_entries = OrderedDict()  # (database, client_id) -> records, least recently used first
+_generations = {}  # (database, client_id) -> times it was invalidated
+_epoch = 0  # Times everything was invalidated
+_lock = threading.Lock()
+
+_SUMMARY = """
+    SELECT 'c', name, paid_amount, owed_amount, total_bill,
+           (SELECT COUNT(*) FROM orders WHERE client_id = clients.id),
+           (SELECT COUNT(*) FROM payments WHERE client_id = clients.id), NULL, NULL, NULL, NULL
+    FROM clients WHERE id = ?
+"""
+_ORDERS = """
+    SELECT 'o', id, order_name, order_type, width, length, price_per_cm, total_price, payment_type, order_date, order_day
+    FROM orders WHERE client_id = ? AND id > ? ORDER BY id LIMIT ?
+"""
+_PAYMENTS = """
+    SELECT 'p', id, payment_date, payment_day, amount_paid, NULL, NULL, NULL, NULL, NULL, NULL
+    FROM payments WHERE client_id = ? AND id > ? ORDER BY id LIMIT ?
+"""
+# One statement, so one round trip and one consistent snapshot; the first column says which part a row is
+RECORDS_SQL = f"{_SUMMARY} UNION ALL SELECT * FROM ({_ORDERS}) UNION ALL SELECT * FROM ({_PAYMENTS})"
+
+
+def read_records(client_id, limit=PAGE_SIZE):
+    """(summary row or None, first order rows, first payment rows) straight from the database."""
+    summary, orders, payments = None, [], []
+    for row in database.fetch_all(RECORDS_SQL, (client_id, client_id, 0, limit, client_id, 0, limit)):
+        if row[0] == "o":
+            orders.append(row[1:])
+        elif row[0] == "p":
+            payments.append(row[1:5])
+        else:
+            summary = row[1:7]
+    return summary, orders, payments
+
+
+def _read_from_service(client_id):
+    try:
+        records = service_client.get(f"/clients/{client_id}/records")
+    except service_client.ServiceError as e:
+        if e.kind != "not_found":
+            raise
+        return None, [], []
+    return (tuple(records["summary"][column] for column in SUMMARY_COLUMNS),
+            [tuple(order[column] for column in ORDER_COLUMNS) for order in records["orders"]],
+            [tuple(payment[column] for column in PAYMENT_COLUMNS) for payment in records["payments"]])
+
+
+def _read_page(table, columns, sql, client_id, after_id, limit):
+    if service_client.URL:
+        rows = service_client.get(f"/clients/{client_id}/{table}?after={after_id}&limit={limit}")
+        return [tuple(row[column] for column in columns) for row in rows]
+    return [row[1:len(columns) + 1] for row in database.fetch_all(sql, (client_id, after_id, limit))]
+
+
+def read_orders(client_id, after_id=0, limit=PAGE_SIZE):
+    """The client's orders with an id above after_id, by id."""
+    return _read_page("orders", ORDER_COLUMNS, _ORDERS, client_id, after_id, limit)
+
+
+def read_payments(client_id, after_id=0, limit=PAGE_SIZE):
+    """The client's payments with an id above after_id, by id."""
+    return _read_page("payments", PAYMENT_COLUMNS, _PAYMENTS, client_id, after_id, limit)
+
+
+def read_summary(client_id):
+    """The client's summary row alone, or None."""
+    if service_client.URL:
+        return _read_from_service(client_id)[0]
+    row = database.fetch_one(_SUMMARY, (client_id,))
+    return row[1:7] if row else None
+
+
+def _key(client_id):
+    return database.DB_PATH, client_id
+
+
+def get(client_id):
+    """The cached records of client_id, or None."""
+    key = _key(client_id)
+    with _lock:
+        records = _entries.get(key)
+        if records is not None:
+            _entries.move_to_end(key)
+        return records
+
+
+def load(client_id):
+    """(summary or None, first order rows, first payment rows) of client_id, from the cache if it has them."""
+    if service_client.URL:
+        return _read_from_service(client_id)
+    records = get(client_id)
+    if records is not None:
+        return records
+    key = _key(client_id)
+    with _lock:
+        stamp = _epoch, _generations.get(key, 0)
+    records = read_records(client_id)
+    _store(key, stamp, records)
+    return records
+
+
+def _store(key, stamp, records):
+    with _lock:
+        if stamp != (_epoch, _generations.get(key, 0)):
+            return  # The client changed while we were reading
+        _entries[key] = records
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_CLIENTS:
+            _entries.popitem(last=False)
+
+
+def invalidate(client_id):
+    key = _key(client_id)
+    with _lock:
+        _generations[key] = _generations.get(key, 0) + 1
+        _entries.pop(key, None)
+
+
+def clear():
+    global _epoch
+    with _lock:
+        _epoch += 1
+        _entries.clear()
+
+
+def _on_change(event):
+    if event.action == "reload":
+        clear()
+    elif event.client_id is not None:
+        invalidate(event.client_id)
+
+
+change_bus.subscribe(_on_change)
@@ -0,0 +1,87 @@
+import database
+import dates
+import migrations
+
+
+def daily_revenue(start_iso, end_iso):
+    """[(iso_date, total)] for every day with payments in [start_iso, end_iso), oldest first.
+
+    Reads the trigger-maintained daily_revenue rollup, so the cost depends on the
+    number of days asked for rather than the number of payments.
+    """
+    return database.fetch_all("""
+        SELECT day, total
+        FROM daily_revenue
+        WHERE day >= ? AND day < ?
+        ORDER BY day
+    """, (start_iso, end_iso))
+
+
+def monthly_revenue(year, month):
+    return daily_revenue(*dates.month_range(year, month))
+
+
+def yearly_revenue(year):
+    """[(month, total)] for the months of the year that have payments."""
+    return database.fetch_all("""
+        SELECT CAST(substr(day, 6, 2) AS INTEGER), SUM(total)
+        FROM daily_revenue
+        WHERE day >= ? AND day < ?
+        GROUP BY substr(day, 6, 2)
+        ORDER BY 1
+    """, (f"{year:04d}-01-01", f"{year + 1:04d}-01-01"))
+
+
+def payment_years():
+    """Range of years that have payments, read from both ends of the rollup."""
+    first, last = database.fetch_one("""
+        SELECT (SELECT MIN(day) FROM daily_revenue), (SELECT MAX(day) FROM daily_revenue)
+    """)
+    if first is None:
+        return []
+    return list(range(int(first[:4]), int(last[:4]) + 1))
+
+
+def balance_mismatches(tolerance=0.005):
+    """[(id, name, paid, owed, total_bill)] of clients whose bill isn't paid + owed, or who owe a negative amount.
+
+    New clients start with total_bill = paid + owed, and the balance triggers
+    keep that true, so any row here was changed outside the application.
+    """
+    return database.fetch_all("""
+        SELECT id, name, paid_amount, owed_amount, total_bill
+        FROM clients
+        WHERE ABS(total_bill - paid_amount - owed_amount) > ? OR owed_amount < -?
+        ORDER BY id
+    """, (tolerance, tolerance))
+
+
+def revenue_mismatches(tolerance=0.005):
+    """[(day, rollup total, payments total)] for days where daily_revenue disagrees with payments."""
+    return database.fetch_all("""
+        WITH actual AS (
+            SELECT payment_date_iso AS day, SUM(COALESCE(amount_paid, 0)) AS total
+            FROM payments
+            WHERE payment_date_iso IS NOT NULL
+            GROUP BY payment_date_iso
+        )
+        SELECT actual.day, daily_revenue.total, actual.total
+        FROM actual LEFT JOIN daily_revenue ON daily_revenue.day = actual.day
+        WHERE daily_revenue.day IS NULL OR ABS(daily_revenue.total - actual.total) > ?
+        UNION ALL
+        SELECT daily_revenue.day, daily_revenue.total, NULL
+        FROM daily_revenue
+        WHERE NOT EXISTS (SELECT 1 FROM payments WHERE payment_date_iso = daily_revenue.day)
+        ORDER BY 1
+    """, (tolerance,))
+
+
+def rebuild_daily_revenue():
+    """Recompute the rollup from scratch, e.g. after payments were edited with an outside tool."""
+    with database.transaction(immediate=True) as conn:
+        return migrations.rebuild_daily_revenue(conn)
+
+
+if __name__ == "__main__":
+    # One-shot rebuild for existing databases: python reports.py
+    print(f"Rebuilt daily revenue for {rebuild_daily_revenue()} days.")
@@ -0,0 +1,521 @@
+"""Local JSON/HTTP service that owns the database for several front-ends.
+
+    python service.py --db business.db --port 8765
+    python service.py check        # start it in-process on a scratch database and exercise every route
+
+It listens on 127.0.0.1 only. Reads run on a pool of READ_CONNECTIONS threads,
+each with its own connection. Every write goes through one writer task. The
+writer collects whatever has been queued (up to WRITE_BATCH requests) and
+applies it in a single transaction, with a savepoint per request so that a
+refused payment doesn't undo its neighbours. The database is opened in shared
+(WAL) mode so reads never wait for the writer.
+
+Routes (bodies and responses are JSON; writes take the operations.py
+parameters by name and answer {"result": ...}):
+
+    GET    /health
+    GET    /clients[?limit=&offset=]     GET /clients/<id>
+    GET    /clients/<id>/orders[?after=&limit=]    GET /clients/<id>/payments[?after=&limit=]
+    GET    /clients/<id>/records         (the client's summary and first page of orders and payments)
+    GET    /orders/<id>                  GET /payments/<id>
+    GET    /orders[?after=&limit=&order_id=]       (the orders editor's pages, rows as lists)
+    GET    /payments[?sort=&descending=&after=&after_value=&limit=&payment_id=&row=
+                     &client_id=&date_from=&date_to=&amount_min=&amount_max=]
+                                         (the payments editor's pages, rows as lists)
+    GET    /changes                      (versions that move when anything / the clients change)
+    GET    /financials/years             GET /financials/<year>    GET /financials/<year>/<month>
+    POST   /clients   /orders   /payments
+    PUT    /clients/<id>   /orders/<id>   /payments/<id>
+    DELETE /clients/<id>   /orders/<id>   /payments/<id>
+
+Front-ends become thin clients of it by setting BUSINESS_SERVICE_URL (see
+service_client.py).
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import database
+import editor_pages
+import operations
+import records_cache
+import reports
+import service_client
+
+HOST = "127.0.0.1"
+PORT = 8765
+READ_CONNECTIONS = 4
+WRITE_BATCH = 100
+MAX_BODY = 1_000_000  # Bytes
+
+# Payments editor filter -> type of its query parameter
+PAYMENT_FILTER_TYPES = {"client_id": int, "date_from": str, "date_to": str, "amount_min": float, "amount_max": float}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, kind=None):
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+
+
+def _rows(sql, params=()):
+    cursor = database.execute(sql, params)
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _row(sql, params, what):
+    rows = _rows(sql, params)
+    if not rows:
+        raise HTTPError(404, f"{what} not found", "not_found")
+    return rows[0]
+
+
+# Read handlers run on a reader thread; they take the path groups (as ints) and the query string
+
+def _health(query):
+    return {"status": "ok", "schema_version": database.fetch_one("PRAGMA user_version")[0]}
+
+
+def _clients(query):
+    limit = int(query.get("limit", ["-1"])[0])
+    offset = int(query.get("offset", ["0"])[0])
+    return _rows("SELECT id, name, paid_amount, owed_amount, total_bill FROM clients ORDER BY id LIMIT ? OFFSET ?",
+                 (limit, offset))
+
+
+def _client(query, client_id):
+    return _row("SELECT id, name, paid_amount, owed_amount, total_bill FROM clients WHERE id = ?", (client_id,),
+                "client")
+
+
+def _page(query):
+    """(after id, limit) from ?after=&limit=; everything by default."""
+    return int(query.get("after", ["0"])[0]), int(query.get("limit", ["-1"])[0])
+
+
+def _value(query, name, convert, default=None):
+    return convert(query[name][0]) if name in query else default
+
+
+def _client_orders(query, client_id):
+    return _rows("SELECT * FROM orders WHERE client_id = ? AND id > ? ORDER BY id LIMIT ?",
+                 (client_id,) + _page(query))
+
+
+def _client_payments(query, client_id):
+    return _rows("SELECT * FROM payments WHERE client_id = ? AND id > ? ORDER BY id LIMIT ?",
+                 (client_id,) + _page(query))
+
+
+def _client_records(query, client_id):
+    summary, orders, payments = records_cache.read_records(client_id)
+    if summary is None:
+        raise HTTPError(404, "client not found", "not_found")
+    return {"summary": dict(zip(records_cache.SUMMARY_COLUMNS, summary)),
+            "orders": [dict(zip(records_cache.ORDER_COLUMNS, order)) for order in orders],
+            "payments": [dict(zip(records_cache.PAYMENT_COLUMNS, payment)) for payment in payments]}
+
+
+def _order(query, order_id):
+    return _row("SELECT * FROM orders WHERE id = ?", (order_id,), "order")
+
+
+def _payment(query, payment_id):
+    return _row("SELECT * FROM payments WHERE id = ?", (payment_id,), "payment")
+
+
+def _orders(query):
+    return editor_pages.read_orders(*_page(query), _value(query, "order_id", int))
+
+
+def _payments(query):
+    filters = {name: _value(query, name, convert) for name, convert in PAYMENT_FILTER_TYPES.items()}
+    payment_id = _value(query, "payment_id", int)
+    if "row" in query:
+        row = editor_pages.read_payment(int(query["row"][0]), filters, payment_id)
+        return [] if row is None else [row]
+    sort_column = _value(query, "sort", int, 0)
+    if sort_column not in editor_pages.PAYMENT_SORT_KEYS:
+        raise HTTPError(400, f"payments can't be sorted on column {sort_column}")
+    after = None
+    if "after" in query:
+        # after_value is absent when the last row's sort key was NULL
+        after = int(query["after"][0]), _value(query, "after_value", {0: int, 2: str, 4: float}[sort_column])
+    return editor_pages.read_payments(filters, sort_column, _value(query, "descending", int, 0) == 1, after,
+                                      _value(query, "limit", int, -1), payment_id)
+
+
+# database path -> (when it was opened, connection that only reads PRAGMA data_version)
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def _changes(query):
+    """version moves with every commit to the file, by the service or anyone else; clients
+    with the client list (change_counters)."""
+    # First, so the file is migrated before the watcher's first data_version
+    clients = database.fetch_one("SELECT version FROM change_counters WHERE name = 'clients'")
+    with _watchers_lock:
+        if database.DB_PATH not in _watchers:
+            _watchers[database.DB_PATH] = time.time(), sqlite3.connect(database.DB_PATH, check_same_thread=False)
+        opened, conn = _watchers[database.DB_PATH]
+        # Only commits from other connections move data_version, and this one never writes
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    # opened tells a restarted service's data_version apart from the last one's
+    return {"version": f"{opened}:{data_version}", "clients": clients[0] if clients else 0}
+
+
+def _close_watchers():
+    with _watchers_lock:
+        for _, conn in _watchers.values():
+            conn.close()
+        _watchers.clear()
+
+
+def _years(query):
+    return reports.payment_years()
+
+
+def _year(query, year):
+    return [{"month": month, "total": total} for month, total in reports.yearly_revenue(year)]
+
+
+def _month(query, year, month):
+    if not 1 <= month <= 12:
+        raise HTTPError(400, "month must be 1-12")
+    return [{"day": day, "total": total} for day, total in reports.monthly_revenue(year, month)]
+
+
+READ_ROUTES = [
+    (r"/health", _health),
+    (r"/clients", _clients),
+    (r"/clients/(\d+)", _client),
+    (r"/clients/(\d+)/orders", _client_orders),
+    (r"/clients/(\d+)/payments", _client_payments),
+    (r"/clients/(\d+)/records", _client_records),
+    (r"/orders/(\d+)", _order),
+    (r"/payments/(\d+)", _payment),
+    (r"/orders", _orders),
+    (r"/payments", _payments),
+    (r"/changes", _changes),
+    (r"/financials/years", _years),
+    (r"/financials/(\d{4})", _year),
+    (r"/financials/(\d{4})/(\d{1,2})", _month),
+]
+READ_ROUTES = [(re.compile(pattern + "$"), handler) for pattern, handler in READ_ROUTES]
+
+# (method, compiled path) -> (operations function name, parameter taken from the path)
+WRITE_ROUTES = {
+    (method, re.compile(re.escape(path).replace(r"\{\}", r"(\d+)") + "$")): (name, path_parameter)
+    for name, (method, path, path_parameter) in service_client.OPERATION_ROUTES.items()
+}
+
+
+def _apply_batch(batch):
+    """Writer thread: run [(name, kwargs)] in one transaction; returns [(result, error)] in the same order."""
+    conn = database.get_connection()
+
+    def apply():
+        outcomes = []
+        for name, kwargs in batch:
+            conn.execute("SAVEPOINT request")
+            try:
+                # __wrapped__ is the function itself, without the retry / thin-client wrapper
+                outcomes.append((getattr(operations, name).__wrapped__(**kwargs), None))
+            except Exception as e:
+                conn.execute("ROLLBACK TO request")
+                outcomes.append((None, e))
+            conn.execute("RELEASE request")
+        return outcomes
+
+    return database.run_write(apply)
+
+
+def _write_error(error):
+    if isinstance(error, operations.BalanceError):
+        return HTTPError(409, "payment is larger than what the client owes", "balance")
+    if isinstance(error, TypeError):
+        return HTTPError(400, str(error))
+    if isinstance(error, sqlite3.IntegrityError):
+        return HTTPError(409, str(error), "integrity")
+    return HTTPError(500, str(error))
+
+
+class Service:
+    """The service on one event loop; start() and stop() are coroutines."""
+
+    def __init__(self, host=HOST, port=PORT, read_connections=READ_CONNECTIONS):
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            raise ValueError("The service only listens on localhost")
+        self.host = host
+        self.port = port
+        self.readers = ThreadPoolExecutor(read_connections, thread_name_prefix="service-read")
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="service-write")
+        self.queue = None
+        self.server = None
+        self.writer_task = None
+
+    async def start(self):
+        database.SERVICE = True
+        if not database.SHARED_MODE:
+            database.set_shared_mode(True)
+        self.queue = asyncio.Queue()
+        self.writer_task = asyncio.ensure_future(self._write_loop())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # The real one when port 0 was asked for
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.writer_task.cancel()
+        try:
+            await self.writer_task
+        except asyncio.CancelledError:
+            pass
+        self.readers.shutdown()
+        self.writer.shutdown()
+        _close_watchers()
+        database.close_all()
+
+    async def _write_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < WRITE_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                outcomes = await loop.run_in_executor(self.writer, _apply_batch,
+                                                      [(name, kwargs) for name, kwargs, _ in batch])
+            except Exception as e:
+                outcomes = [(None, e)] * len(batch)
+            for (_, _, future), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    async def _dispatch(self, method, target, body):
+        split = urlsplit(target)
+        path, query = split.path.rstrip("/") or "/", parse_qs(split.query)
+
+        for (route_method, pattern), (name, path_parameter) in WRITE_ROUTES.items():
+            match = pattern.match(path)
+            if match and route_method == method:
+                try:
+                    kwargs = json.loads(body or b"{}")
+                except ValueError:
+                    raise HTTPError(400, "body is not valid JSON")
+                if not isinstance(kwargs, dict):
+                    raise HTTPError(400, "body must be a JSON object")
+                if path_parameter:
+                    kwargs[path_parameter] = int(match.group(1))
+                future = asyncio.get_event_loop().create_future()
+                await self.queue.put((name, kwargs, future))
+                try:
+                    return {"result": await future}
+                except Exception as e:
+                    raise _write_error(e)
+
+        for pattern, handler in READ_ROUTES:
+            match = pattern.match(path)
+            if match:
+                if method != "GET":
+                    raise HTTPError(405, f"{method} is not allowed on {path}")
+                args = [int(group) for group in match.groups()]
+                try:
+                    return await asyncio.get_event_loop().run_in_executor(self.readers, handler, query, *args)
+                except ValueError as e:
+                    raise HTTPError(400, str(e))
+        if any(pattern.match(path) for _, pattern in WRITE_ROUTES):
+            raise HTTPError(405, f"{method} is not allowed on {path}")
+        raise HTTPError(404, f"no route for {path}", "not_found")
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": "request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    try:
+                        status, payload = 200, await self._dispatch(method.upper(), target, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {"error": str(e), "kind": e.kind}
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                             f"Content-Type: application/json; charset=utf-8\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def serve(host=HOST, port=PORT):
+    async def run():
+        service = Service(host, port)
+        await service.start()
+        print(f"Serving {database.DB_PATH} on http://{service.host}:{service.port}", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def check():
+    """Start the service in-process on a scratch database and exercise every route; returns problems found."""
+    problems = []
+
+    def expect(label, condition):
+        print(f"{'ok' if condition else 'FAILED':<8}{label}")
+        if not condition:
+            problems.append(label)
+
+    def call(method, path, body=None):
+        try:
+            return 200, service_client.request(method, path, body)
+        except service_client.ServiceError as e:
+            return e.status, e.kind
+
+    async def run(service):
+        loop = asyncio.get_event_loop()
+        await service.start()
+        try:
+            service_client.URL = f"http://{service.host}:{service.port}"
+            # service_client blocks, so it runs on a thread while the loop keeps serving
+            return await loop.run_in_executor(None, exercise)
+        finally:
+            await service.stop()
+
+    def exercise():
+        expect("health", call("GET", "/health")[0] == 200)
+        status, result = call("POST", "/clients", {"name": "عميل تجريبي"})
+        client_id = result["result"]
+        expect("add client", status == 200)
+        # Through operations.py, as a thin-client dialog would
+        order_id = operations.add_order(client_id, "لافتة", "بنر", 100, 200, 0.02, 400, operations.INSTALLMENT)
+        expect("add order through operations", call("GET", f"/orders/{order_id}")[1]["total_price"] == 400)
+        operations.add_payment(client_id, 150)
+        client = call("GET", f"/clients/{client_id}")[1]
+        expect("balances after payment", (client["paid_amount"], client["owed_amount"], client["total_bill"])
+               == (150, 250, 400))
+        try:
+            operations.add_payment(client_id, 1000)
+            expect("overpayment refused", False)
+        except operations.BalanceError:
+            expect("overpayment refused", True)
+        expect("client orders", len(call("GET", f"/clients/{client_id}/orders")[1]) == 1)
+        payments = call("GET", f"/clients/{client_id}/payments")[1]
+        expect("client payments", [payment["amount_paid"] for payment in payments] == [150])
+        records = call("GET", f"/clients/{client_id}/records")[1]
+        expect("client records", (records["summary"]["paid_amount"], records["summary"]["order_count"],
+                                  len(records["orders"]), len(records["payments"])) == (150, 1, 1, 1))
+        expect("client orders page", call("GET", f"/clients/{client_id}/orders?after={order_id}&limit=10")[1] == [])
+        # The editors' pages, through editor_pages as a thin-client dialog would
+        expect("orders editor page", [row[0] for row in editor_pages.orders_after(0, 10)] == [order_id])
+        expect("order row", editor_pages.order_row(order_id)[5] == "عميل تجريبي")
+        payment_id = payments[0]["id"]
+        expect("payments editor page", editor_pages.payments_after({"amount_min": 100.0}, 4, True, None, 10)
+               == [(payment_id, "عميل تجريبي", payments[0]["payment_date"], payments[0]["payment_day"], 150,
+                    payments[0]["payment_date_iso"], client_id)])
+        expect("payments editor next page", editor_pages.payments_after({}, 2, False, (payment_id, payments[0][
+            "payment_date_iso"]), 10) == [])
+        expect("filtered out payment row", editor_pages.payment_row(payment_id, {"client_id": client_id + 1}) is None)
+        expect("unsortable column", call("GET", "/payments?sort=1")[0] == 400)
+        changes = call("GET", "/changes")[1]
+        operations.update_client(client_id, "عميل معدل", 150, 250, 400)
+        changed = call("GET", "/changes")[1]
+        expect("changes", changed["version"] != changes["version"] and changed["clients"] == changes["clients"] + 1)
+        expect("client row", service_client.get_row(f"/clients/{client_id}")[:2] == (client_id, "عميل معدل"))
+        expect("missing row", service_client.get_row("/orders/999999") is None)
+        year, month = map(int, payments[0]["payment_date_iso"].split("-")[:2])
+        expect("financials month", call("GET", f"/financials/{year}/{month}")[1][0]["total"] == 150)
+        expect("financials year", call("GET", f"/financials/{year}")[1] == [{"month": month, "total": 150}])
+        expect("financials years", call("GET", "/financials/years")[1] == [year])
+        expect("delete client with orders refused", call("DELETE", f"/clients/{client_id}")[1]["result"] is False)
+        status, _ = call("PUT", f"/orders/{order_id}", {"order_name": "x"})
+        expect("missing parameters rejected", status == 400)
+        expect("unknown client", call("GET", "/clients/999999") == (404, "not_found"))
+        expect("unknown route", call("GET", "/nothing")[0] == 404)
+        expect("wrong method", call("POST", "/financials/years")[0] == 405)
+
+        # Concurrent writers end up in shared batches; none may be lost
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda i: call("POST", "/clients", {"name": f"عميل {i}"}), range(200)))
+        expect("concurrent writes", all(status == 200 for status, _ in results)
+               and len(call("GET", "/clients")[1]) == 201)
+        expect("client paging", [c["id"] for c in call("GET", "/clients?limit=2&offset=1")[1]]
+               == [c["id"] for c in call("GET", "/clients")[1][1:3]])
+
+    saved_url = service_client.URL
+    saved_path, saved_shared, saved_service = database.DB_PATH, database.SHARED_MODE, database.SERVICE
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "service.db"))
+        try:
+            asyncio.run(run(Service(port=0)))
+        finally:
+            service_client.URL = saved_url
+            database.set_database_path(saved_path)
+            database.set_shared_mode(saved_shared)
+            database.SERVICE = saved_service
+    print("FAILED" if problems else "All service checks passed.")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local JSON service over the business database.")
+    parser.add_argument("command", nargs="?", choices=["serve", "check"], default="serve")
+    parser.add_argument("--db", help=f"database file (default {database.DB_PATH})")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+    if args.command == "check":
+        return 1 if check() else 0
+    if args.db:
+        database.set_database_path(args.db)
+    serve(port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Thin-client side of service.py.
+
+With BUSINESS_SERVICE_URL set (e.g. http://127.0.0.1:8765), the front-end
+never opens the database file (database.get_connection() refuses to): the
+write paths in operations.py, every dialog read and the client pickers go
+through the local service, and models.ChangeNotifier polls GET /changes
+instead of PRAGMA data_version. Only the exports, which stream whole tables,
+are not available in this mode. OPERATION_ROUTES is the URL layout of the
+write endpoints, shared with service.py.
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+
+URL = os.environ.get("BUSINESS_SERVICE_URL") or None
+TIMEOUT = 10  # Seconds
+
+# operations.py function -> (method, path, parameter taken from the path)
+OPERATION_ROUTES = {
+    "add_client": ("POST", "/clients", None),
+    "update_client": ("PUT", "/clients/{}", "client_id"),
+    "delete_client": ("DELETE", "/clients/{}", "client_id"),
+    "add_order": ("POST", "/orders", None),
+    "update_order": ("PUT", "/orders/{}", "order_id"),
+    "delete_order": ("DELETE", "/orders/{}", "order_id"),
+    "add_payment": ("POST", "/payments", None),
+    "update_payment": ("PUT", "/payments/{}", "payment_id"),
+    "delete_payment": ("DELETE", "/payments/{}", "payment_id"),
+}
+
+
+class ServiceError(Exception):
+    """An error response from the service; kind is e.g. "balance" or "not_found"."""
+
+    def __init__(self, status, message, kind=None):
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+
+
+def request(method, path, body=None, timeout=TIMEOUT):
+    data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    req = urllib.request.Request(URL.rstrip("/") + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            payload = json.loads(e.read())
+        except ValueError:
+            payload = {}
+        raise ServiceError(e.code, payload.get("error", e.reason), payload.get("kind")) from None
+
+
+def get(path, timeout=TIMEOUT):
+    return request("GET", path, timeout=timeout)
+
+
+def get_row(path):
+    """The record at path as a tuple in column order (like SELECT *), or None if the service has no such record."""
+    try:
+        return tuple(get(path).values())
+    except ServiceError as e:
+        if e.kind != "not_found":
+            raise
+        return None
+
+
+def run_operation(name, arguments):
+    """Call operations.<name> on the service with the given {parameter: value} and return its result."""
+    method, path, path_parameter = OPERATION_ROUTES[name]
+    arguments = dict(arguments)
+    if path_parameter:
+        path = path.format(arguments.pop(path_parameter))
+    return request(method, path, arguments)["result"]
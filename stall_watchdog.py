@@ -0,0 +1,137 @@
+"""Watchdog that logs where the GUI thread was stuck whenever it stops responding.
+
+A QTimer on the main thread ticks every TICK_MS. A background thread checks
+how long ago the last tick was, and once that passes the threshold it
+captures the main thread's Python stack. When the event loop runs again, the
+next tick logs how long the stall lasted, which dialog method it was in
+(e.g. ClientRecordsDialog.update_client_info_and_tables) and the stack, to a
+rotating log file next to the database (BUSINESS_STALL_LOG overrides it). It
+is only a diagnostic: if the log can't be opened the app runs without it.
+
+The stack is taken when the stall crosses the threshold, so it shows where
+the thread was stuck at that point rather than where the stall started.
+"""
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+import traceback
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWidgets import QWidget
+
+import database
+
+TICK_MS = 50
+STALL_MS = 500  # Default threshold; BUSINESS_STALL_MS overrides it and 0 turns the watchdog off
+LOG_NAME = "stalls.log"  # In the database's folder, which the app has to be able to write to anyway
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _location(frame):
+    """'Class.method' of the innermost method of a widget of ours on the stack, else the innermost function of ours."""
+    fallback = None
+    while frame is not None:
+        path = os.path.abspath(frame.f_code.co_filename)
+        if os.path.dirname(path) == _APP_DIR and path != os.path.abspath(__file__):
+            owner = frame.f_locals.get("self")
+            if isinstance(owner, QWidget):
+                return f"{type(owner).__name__}.{frame.f_code.co_name}"
+            if fallback is None:
+                name = frame.f_globals.get("__name__", "?")
+                fallback = f"{type(owner).__name__ if owner is not None else name}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "event loop"
+
+
+class StallWatchdog(QObject):
+    """Create and start() it on the main thread, after the QApplication."""
+
+    def __init__(self, threshold_ms=STALL_MS, log_path=None, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.main_thread_id = threading.get_ident()
+        if log_path is None:
+            log_path = os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), LOG_NAME)
+        self.handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=1_000_000, backupCount=3,
+                                                            encoding="utf-8")
+        self.handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.logger = logging.getLogger("business.stalls")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+        self._lock = threading.Lock()
+        self._last_tick = time.perf_counter()
+        self._captured = None  # (location, stack lines) of the stall in progress
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self.timer = QTimer(self)
+        self.timer.setInterval(TICK_MS)
+        self.timer.timeout.connect(self._tick)
+
+    def start(self):
+        self.logger.addHandler(self.handler)
+        self._last_tick = time.perf_counter()
+        self.timer.start()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.timer.stop()
+        self._thread.join()
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def _tick(self):
+        now = time.perf_counter()
+        with self._lock:
+            # Time beyond the timer's own interval is time the event loop was blocked
+            stalled = now - self._last_tick - TICK_MS / 1000
+            self._last_tick = now
+            captured, self._captured = self._captured, None
+        if stalled >= self.threshold:
+            self._report(stalled, captured)
+
+    def _watch(self):
+        interval = min(self.threshold / 4, 0.1)
+        while not self._stopped.wait(interval):
+            with self._lock:
+                last_tick = self._last_tick
+                blocked = time.perf_counter() - last_tick - TICK_MS / 1000
+                if blocked < self.threshold or self._captured is not None:
+                    continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is None:
+                continue
+            captured = (_location(frame), traceback.format_stack(frame))
+            with self._lock:
+                # Dropped if the event loop got going again while the stack was being taken
+                if self._last_tick == last_tick:
+                    self._captured = captured
+            del frame
+
+    def _report(self, stalled, captured):
+        if captured is None:
+            # Over before the watchdog thread looked
+            self.logger.warning(f"GUI thread blocked for {stalled * 1000:.0f} ms (stack not captured)")
+            return
+        location, stack = captured
+        self.logger.warning(f"GUI thread blocked for {stalled * 1000:.0f} ms in {location}\n" + "".join(stack))
+
+
+def start_from_environment(parent=None):
+    """Start a watchdog configured by BUSINESS_STALL_MS / BUSINESS_STALL_LOG, or return None if it is off
+    (or can't be set up, which never stops the app from starting)."""
+    try:
+        threshold_ms = float(os.environ.get("BUSINESS_STALL_MS", STALL_MS))
+        if threshold_ms <= 0:
+            return None
+        watchdog = StallWatchdog(threshold_ms, os.environ.get("BUSINESS_STALL_LOG"), parent)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Stall watchdog off: {e}")
+        return None
+    watchdog.start()
+    return watchdog
@@ -0,0 +1,154 @@
+"""Multi-process write stress test for shared (multi-desk) mode.
+
+    python stress.py --processes 4 --writes 300 --readers 2
+    python stress.py --no-shared        # the same load without shared mode, for comparison
+
+Creates a fresh database in a temporary folder, then starts --processes
+writer processes, each making --writes calls to operations.add_order /
+add_payment for random clients, alongside --readers processes running the
+client records and financials queries. Every write path retries while
+locked, so the run passes only if no write raised a lock error, every order
+and payment that was reported saved is in the database, and the client
+balances and the daily revenue rollup still add up. Exits with status 1
+otherwise.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+import operations
+import records_cache
+import reports
+
+CLIENTS = 20
+
+
+def _connect(path, shared, journal_mode):
+    database.set_database_path(path)
+    database.set_shared_mode(shared, journal_mode)
+
+
+def _writer(path, shared, journal_mode, seed, writes):
+    """Returns ({outcome: count}, [error messages])."""
+    _connect(path, shared, journal_mode)
+    rng = random.Random(seed)
+    client_ids = [row[0] for row in database.fetch_all("SELECT id FROM clients")]
+    counts = {"orders": 0, "cash orders": 0, "payments": 0, "refused payments": 0}
+    errors = []
+    for _ in range(writes):
+        client_id = rng.choice(client_ids)
+        try:
+            if rng.random() < 0.5:
+                payment_type = rng.choice([operations.CASH, operations.INSTALLMENT])
+                operations.add_order(client_id, "لافتة", "بنر", 100, 100, 0.01, 100, payment_type)
+                counts["orders"] += 1
+                counts["cash orders"] += payment_type == operations.CASH
+            else:
+                operations.add_payment(client_id, rng.choice([5, 10, 25]))
+                counts["payments"] += 1
+        except operations.BalanceError:
+            counts["refused payments"] += 1
+        except sqlite3.Error as e:
+            errors.append(str(e))
+    database.close_all()
+    return counts, errors
+
+
+def _reader(path, shared, journal_mode, seed, reads):
+    """Returns ({"reads": count}, [error messages])."""
+    _connect(path, shared, journal_mode)
+    rng = random.Random(seed)
+    errors = []
+    for _ in range(reads):
+        try:
+            client_id = rng.randint(1, CLIENTS)
+            # The client records screen's queries: summary and first pages, then the next page of orders
+            summary, orders, payments = records_cache.read_records(client_id)
+            if orders:
+                records_cache.read_orders(client_id, orders[-1][0])
+            reports.monthly_revenue(*time.localtime()[:2])
+        except sqlite3.Error as e:
+            errors.append(str(e))
+    database.close_all()
+    return {"reads": reads}, errors
+
+
+def _create(path, shared, journal_mode):
+    _connect(path, shared, journal_mode)
+    for i in range(CLIENTS):
+        operations.add_client(f"عميل {i + 1}")
+    database.close_all()
+
+
+def _verify(path, totals):
+    """Problems found in the database after the run, as messages."""
+    database.set_database_path(path)
+    problems = []
+    orders = database.fetch_one("SELECT COUNT(*) FROM orders")[0]
+    payments = database.fetch_one("SELECT COUNT(*) FROM payments")[0]
+    if orders != totals["orders"]:
+        problems.append(f"{totals['orders']} orders saved but {orders} in the database")
+    expected_payments = totals["payments"] + totals["cash orders"]
+    if payments != expected_payments:
+        problems.append(f"{expected_payments} payments saved but {payments} in the database")
+    for client_id, name, paid, owed, total_bill in reports.balance_mismatches():
+        problems.append(f"client {client_id}: paid {paid} + owed {owed} != bill {total_bill}")
+    for day, rollup, actual in reports.revenue_mismatches():
+        problems.append(f"revenue {day}: rollup {rollup} != payments {actual}")
+    database.close_all()
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent writers and readers against one database.")
+    parser.add_argument("--processes", type=int, default=4, help="writer processes")
+    parser.add_argument("--writes", type=int, default=300, help="writes per writer process")
+    parser.add_argument("--readers", type=int, default=2, help="reader processes")
+    parser.add_argument("--journal-mode", default="WAL", help="journal mode in shared mode (WAL or DELETE)")
+    parser.add_argument("--no-shared", action="store_true", help="run without shared mode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    shared = not args.no_shared
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        _create(path, shared, args.journal_mode)
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.processes + args.readers) as pool:
+            results = [pool.apply_async(_writer, (path, shared, args.journal_mode, args.seed + i, args.writes))
+                       for i in range(args.processes)]
+            results += [pool.apply_async(_reader, (path, shared, args.journal_mode, args.seed - i - 1, args.writes))
+                        for i in range(args.readers)]
+            outcomes = [result.get() for result in results]
+        elapsed = time.perf_counter() - started
+
+        totals, errors = {}, []
+        for counts, worker_errors in outcomes:
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+            errors += worker_errors
+        problems = _verify(path, totals)
+
+    print(f"{args.processes} writers x {args.writes} writes, {args.readers} readers, "
+          f"{'shared mode (' + args.journal_mode + ')' if shared else 'default mode'}: {elapsed:.1f} s")
+    for key, value in totals.items():
+        print(f"  {key}: {value}")
+    for message in sorted(set(errors)):
+        print(f"  error x{errors.count(message)}: {message}")
+    for problem in problems:
+        print(f"  problem: {problem}")
+    if errors or problems:
+        print("FAILED")
+        return 1
+    print("OK: no lock errors, no lost writes, balances and revenue consistent")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
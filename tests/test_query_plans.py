@@ -0,0 +1,116 @@
+"""Every query on the hot paths (client records, the editors, the financials,
+the Excel export, deleting a client) must be answered from an index.
+
+The statements checked are the ones the modules really run: each test calls
+the module functions on a freshly migrated database while recording the
+executed SQL, then asks EXPLAIN QUERY PLAN about each of them.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import editor_pages  # noqa: E402
+import migrations  # noqa: E402
+import operations  # noqa: E402
+import records_cache  # noqa: E402
+import reports  # noqa: E402
+import service_client  # noqa: E402
+
+QUERY_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(service_client, "URL", None)
+    saved_path = database.DB_PATH
+    database.set_database_path(str(tmp_path / "business.db"))
+    conn = database.get_connection()
+    assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+    for name in ("أحمد", "فاطمة", "شركة النور"):
+        client_id = operations.add_client(name)
+        operations.add_order(client_id, "لافتة", "بنر", 100, 200, 0.02, 400, operations.INSTALLMENT)
+        operations.add_order(client_id, "ستيكر", "فينيل", 50, 50, 0.05, 125, operations.INSTALLMENT)
+        operations.add_payment(client_id, 150)
+    yield conn
+    database.set_database_path(saved_path)
+
+
+def run_recorded(conn, calls):
+    """Run calls() and return the statements it executed on conn, with their parameters filled in."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        calls()
+    finally:
+        conn.set_trace_callback(None)
+    # Trigger bodies are traced as "-- TRIGGER ..." comments; transaction control has no plan
+    return [sql for sql in statements if sql.lstrip().split(None, 1)[0].upper() in QUERY_KEYWORDS]
+
+
+def assert_indexed(conn, statements):
+    assert statements, "nothing was recorded"
+    assert migrations.check_query_plans(conn, statements) == []
+
+
+def test_client_records(conn):
+    def calls():
+        records_cache.read_records(2)
+        records_cache.read_summary(2)
+        records_cache.read_orders(2, after_id=1, limit=10)
+        records_cache.read_payments(2, after_id=1, limit=10)
+
+    assert_indexed(conn, run_recorded(conn, calls))
+
+
+def test_editors(conn):
+    payment_id, iso_date = database.fetch_one("SELECT id, payment_date_iso FROM payments WHERE client_id = 2")
+    filters = [{}, {"client_id": 2}, {"date_from": iso_date, "date_to": iso_date},
+               {"amount_min": 100.0, "amount_max": 200.0}, {"client_id": 2, "date_from": iso_date}]
+
+    def calls():
+        editor_pages.read_orders(0, 200)
+        editor_pages.read_orders(2, 200)
+        editor_pages.read_orders(0, 1, order_id=3)
+        for sort_column, last_value in ((0, payment_id), (2, iso_date), (4, 150.0)):
+            for descending in (False, True):
+                for page_filters in filters:
+                    editor_pages.read_payments(page_filters, sort_column, descending, None, 200)
+                    editor_pages.read_payments(page_filters, sort_column, descending, (payment_id, last_value), 200)
+                    # A NULL sort key pages the NULL rows by id
+                    editor_pages.read_payments(page_filters, sort_column, descending, (payment_id, None), 200)
+        editor_pages.read_payment(payment_id, {"client_id": 2})
+
+    assert_indexed(conn, run_recorded(conn, calls))
+
+
+def test_financials(conn):
+    year = reports.payment_years()[0]
+
+    def calls():
+        reports.payment_years()
+        reports.yearly_revenue(year)
+        reports.monthly_revenue(year, 1)
+
+    assert_indexed(conn, run_recorded(conn, calls))
+
+
+def test_delete_client(conn):
+    # Refused (the client has orders), but the existence checks run all the same
+    statements = run_recorded(conn, lambda: operations.delete_client(1))
+    assert_indexed(conn, statements)
+
+
+def test_export(conn, tmp_path, monkeypatch):
+    pytest.importorskip("openpyxl")
+    import export
+
+    # One row per page, so every page after the first continues from a real key
+    monkeypatch.setattr(export, "FETCH_SIZE", 1)
+    statements = run_recorded(conn, lambda: export.export_workbook(str(tmp_path / "export.xlsx")))
+    # Counting the clients for the progress bar is the one scan the export accepts (once, on the small table)
+    assert statements[0] == "SELECT COUNT(*) FROM clients"
+    assert_indexed(conn, statements[1:])
@@ -2,7 +2,22 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QMessageBox, QHBoxLayout, QComboBox, QLabel, QLineEdit
 )
 from PyQt6.QtCore import Qt
-import sqlite3
+
+import client_directory
+import database
+import operations
+import query_executor
+import service_client
+from models import follow_changes
+
+
+def load_clients():
+    """[(id, name, paid, owed, total_bill)], from the service in thin-client mode; runs on a query_executor thread."""
+    if service_client.URL:
+        return [(c["id"], c["name"], c["paid_amount"], c["owed_amount"], c["total_bill"])
+                for c in service_client.get("/clients")]
+    return database.fetch_all("SELECT id, name, paid_amount, owed_amount, total_bill FROM clients")
+
 
 class ViewClientsDialog(QDialog):
     def __init__(self, parent, client_id=None):
@@ -70,6 +85,13 @@ class ViewClientsDialog(QDialog):
 
         self.setLayout(self.layout)
 
+        # The list is loaded off the GUI thread, so the dialog shows right away
+        self.clients_query = query_executor.LatestQuery()
+        self.finished.connect(self.clients_query.cancel)
+        self.client_rows = {}  # client id -> table row
+        # Saves anywhere in the application update, add or remove just the rows they touch
+        follow_changes(self, self.apply_change)
+
         # Populate table
         self.populate_table()
 
@@ -79,26 +101,57 @@ class ViewClientsDialog(QDialog):
         self.refresh_button.clicked.connect(self.populate_table)
 
     def populate_table(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, paid_amount, owed_amount, total_bill FROM clients")
-        clients = cursor.fetchall()
-        conn.close()
-
+        self.table.setEnabled(False)
+        self.refresh_button.setText("جارٍ التحميل...")
+        request = self.clients_query.submit(load_clients)
+        request.finished.connect(self.show_clients)
+        request.failed.connect(self.show_load_error)
+
+    def show_load_error(self, message):
+        self.table.setEnabled(True)
+        self.refresh_button.setText("تحديث")
+        QMessageBox.critical(self, "خطأ", f"خطأ في جلب العملاء: {message}")
+
+    def show_clients(self, clients):
+        self.table.setEnabled(True)
+        self.refresh_button.setText("تحديث")
         self.table.clear()
         self.table.setRowCount(len(clients))
         self.table.setColumnCount(5)
         self.table.setHorizontalHeaderLabels(["ID", "الاسم", "المدفوع", "المستحق", "إجمالي الفاتورة"])
 
         for i, client in enumerate(clients):
-            for j in range(5):
-                if j == 0:
-                    self.table.setItem(i, j, QTableWidgetItem(str(client[j])))  # ID
-                else:
-                    self.table.setItem(i, j, QTableWidgetItem(str(client[j])))
+            self.set_row(i, client)
+        self.client_rows = {client[0]: i for i, client in enumerate(clients)}
         self.table.resizeColumnsToContents()  # Autofit columns
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
 
+    def set_row(self, row, client):
+        for j in range(5):
+            self.table.setItem(row, j, QTableWidgetItem(str(client[j])))
+
+    def apply_change(self, event):
+        if event.action == "reload" or self.clients_query.pending:
+            # A load in flight may have read the table before this change
+            self.populate_table()
+            return
+        if event.table != "clients":
+            return
+        row = self.client_rows.get(event.row_id)
+        client = client_directory.read_client(event.row_id)
+        if client is None:
+            if row is not None:
+                self.table.removeRow(row)
+                self.client_rows = {client_id: i if i < row else i - 1
+                                    for client_id, i in self.client_rows.items() if client_id != event.row_id}
+        elif row is None:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.client_rows[event.row_id] = row
+            self.set_row(row, client)
+        else:
+            self.set_row(row, client)
+
     def edit_client(self):
         selected_items = self.table.selectedItems()
         if not selected_items:
@@ -119,23 +172,14 @@ class ViewClientsDialog(QDialog):
         client_id = int(selected_items[0].text())
         confirm = QMessageBox.question(self, "تأكيد الحذف", "هل أنت متأكد من حذف العميل؟", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if confirm == QMessageBox.StandardButton.Yes:
-            conn = sqlite3.connect('business.db')
-            cursor = conn.cursor()
-            # Check if the client has related orders or payments
-            cursor.execute("SELECT COUNT(*) FROM orders WHERE client_id = ?", (client_id,))
-            order_count = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM payments WHERE client_id = ?", (client_id,))
-            payment_count = cursor.fetchone()[0]
-            if order_count > 0 or payment_count > 0:
-                QMessageBox.warning(self, "تحذير", "لا يمكن حذف العميل بسبب وجود طلبات أو مدفوعات مرتبطة به.")
-                conn.close()
-                return
-            # Delete the client
-            cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
-            conn.commit()
-            conn.close()
-            QMessageBox.information(self, "تم الحذف", "تم حذف العميل بنجاح.")
-            self.populate_table()
+            try:
+                # Clients with related orders or payments are kept
+                if not operations.delete_client(client_id):
+                    QMessageBox.warning(self, "تحذير", "لا يمكن حذف العميل بسبب وجود طلبات أو مدفوعات مرتبطة به.")
+                    return
+                QMessageBox.information(self, "تم الحذف", "تم حذف العميل بنجاح.")
+            except operations.ERRORS as e:
+                QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل حذف العميل: {e}")
 
 
 
@@ -197,11 +241,11 @@ class EditClientDialog(QDialog):
         self.cancel_button.clicked.connect(self.close)
 
     def populate_fields(self):
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM clients WHERE id = ?", (self.client_id,))
-        client = cursor.fetchone()
-        conn.close()
+        try:
+            client = client_directory.read_client(self.client_id)
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل جلب بيانات العميل: {e}")
+            return
 
         if client:
             self.name_input.setText(client[1])
@@ -228,18 +272,12 @@ class EditClientDialog(QDialog):
             QMessageBox.warning(self, "تحذير", "البيانات المدخلة غير صحيحة.")
             return
 
-        conn = sqlite3.connect('business.db')
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE clients
-            SET name = ?, paid_amount = ?, owed_amount = ?, total_bill = ?
-            WHERE id = ?
-        """, (name, paid_amount, owed_amount, total_bill, self.client_id))
-        conn.commit()
-        conn.close()
-        QMessageBox.information(self, "نجاح", "تم تعديل العميل بنجاح.")
-        self.close()
-        self.parent().populate_table()
+        try:
+            operations.update_client(self.client_id, name, paid_amount, owed_amount, total_bill)
+            QMessageBox.information(self, "نجاح", "تم تعديل العميل بنجاح.")
+            self.close()
+        except operations.ERRORS as e:
+            QMessageBox.critical(self, "خطأ في قاعدة البيانات", f"فشل تعديل العميل: {e}")
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+from PyQt6.QtWidgets import QLineEdit, QCompleter
+from PyQt6.QtCore import Qt, QModelIndex, QTimer, pyqtSignal
+
+from models import ClientSearchModel
+
+
+class ClientSearchBox(QLineEdit):
+    """Type-ahead client search; emits client_selected(client_id) when a match is picked.
+
+    The query runs once typing pauses for DEBOUNCE_MS, against the client_search
+    index, so each lookup returns only the top matches.
+    """
+    client_selected = pyqtSignal(int)
+    DEBOUNCE_MS = 150
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText("ابحث عن عميل...")
+        self.setStyleSheet("""
+            background-color: #ffffff;
+            color: #000000;
+            border: 1px solid #ccc;
+            border-radius: 5px;
+        """)
+
+        self.results = ClientSearchModel(self)
+        self.completer = QCompleter(self.results, self)
+        # The model already holds only the matches, so the completer must not filter again
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.setCompleter(self.completer)
+        self.completer.activated[QModelIndex].connect(self.on_activated)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(self.search)
+        self.textEdited.connect(lambda _text: self.timer.start())
+
+    def search(self):
+        self.results.search(self.text())
+        if self.results.rowCount():
+            self.completer.complete()
+
+    def on_activated(self, index):
+        client_id = index.data(Qt.ItemDataRole.UserRole)
+        if client_id is not None:
+            self.client_selected.emit(client_id)